@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -97,6 +98,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Deployments need a cache shared by all uWSGI workers (memcached in
+# docker-compose-deploy.yml). With the local memory default the recipe
+# response cache is off and token revocations are read from the database.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -134,10 +152,13 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = '/static/static/'
-MEDIA_URL = '/static/media/'
+# Media is only served after an ownership check, see RecipeMediaView.
+MEDIA_URL = '/api/recipe/media/'
 
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
+# nginx internal location aliased to MEDIA_ROOT, see proxy/default.conf.tpl
+MEDIA_ACCEL_REDIRECT_URL = '/protected-media/'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -149,8 +170,89 @@ AUTH_USER_MODEL = 'core.User'
 # Configure DRF to use drf_spectacular to generate the schema
 REST_FRAMEWORK= {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Maximum number of recipes accepted by one bulk create request
+RECIPE_BULK_MAX_BATCH_SIZE = int(
+    os.environ.get('RECIPE_BULK_MAX_BATCH_SIZE', 500)
+)
+
+# Seconds to cache Recipe API list/detail responses, 0 to disable.
+# Only used with a shared cache backend, see core.cache.is_shared.
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    os.environ.get('RECIPE_RESPONSE_CACHE_TIMEOUT', 300)
+)
+
+# Largest accepted recipe image upload, matches client_max_body_size
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+
+# Largest accepted recipe image width or height
+RECIPE_IMAGE_MAX_DIMENSION = int(
+    os.environ.get('RECIPE_IMAGE_MAX_DIMENSION', 8000)
+)
+
+# Largest accepted number of pixels of a recipe image
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40_000_000)
+)
+
+# Threads rendering recipe image renditions per worker, 0 renders inline
+RECIPE_RENDITION_WORKERS = int(
+    os.environ.get('RECIPE_RENDITION_WORKERS', 2)
+)
+
+# Renditions waiting for a thread before new uploads are left to backfill
+RECIPE_RENDITION_QUEUE_SIZE = int(
+    os.environ.get('RECIPE_RENDITION_QUEUE_SIZE', 32)
+)
+
+# Seconds a worker trusts a cached token lookup, 0 to disable the cache.
+# Other workers accept deleted tokens and deactivated users this long.
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', 5)
+)
+
+# Maximum number of tokens cached per worker
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+
+# Lookups between logs of the token cache statistics, 0 to never log
+AUTH_TOKEN_CACHE_STATS_INTERVAL = int(
+    os.environ.get('AUTH_TOKEN_CACHE_STATS_INTERVAL', 10000)
+)
+
+# Token cache statistics go to the worker's stderr
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'user.authentication': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Lifetime in seconds of signed access tokens
+AUTH_ACCESS_TOKEN_LIFETIME = int(
+    os.environ.get('AUTH_ACCESS_TOKEN_LIFETIME', 300)
+)
+
+# Lifetime in seconds of refresh tokens
+AUTH_REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get('AUTH_REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600)
+)
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
@@ -0,0 +1,15 @@
+"""
+Helpers for the configured caches.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_shared(alias='default'):
+    """Return whether the cache is shared by every process.
+
+    uWSGI runs several workers, each with its own local memory cache, so
+    state cached there is only seen, and only invalidated, by one worker.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
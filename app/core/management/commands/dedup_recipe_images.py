@@ -0,0 +1,116 @@
+"""
+Django command to deduplicate recipe images by content.
+"""
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Now
+
+from core.models import Recipe
+from core.storage import (
+    file_digest,
+    image_references,
+    link_file,
+    lock_images,
+    sharded_image_path,
+)
+from recipe.cache import bump_generation
+from recipe.renditions import image_files, link_renditions
+
+# Images already stored under the hash of their content.
+CONTENT_ADDRESSED_RE = (
+    r'^uploads/recipe/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[^/]*)?$'
+)
+
+
+class Command(BaseCommand):
+    """Rename recipe images to content hashes, sharing identical files."""
+    help = (
+        'Rename recipe images to the SHA-256 of their content, so recipes '
+        'using identical images share one file, and remove the redundant '
+        'copies. Files are linked before Recipe.image is rewritten and '
+        'removed after, so images stay reachable; the command can be '
+        'stopped and run again at any time. Renditions are linked along; '
+        'those with missing files are reset for backfill_renditions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of image files rewritten per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        pending = Recipe.objects.exclude(image='').exclude(
+            image=None,
+        ).exclude(image__regex=CONTENT_ADDRESSED_RE)
+        renamed = duplicates = missing = reclaimed = 0
+        last_name = ''
+        while True:
+            names = list(
+                pending.filter(image__gt=last_name).order_by('image')
+                .values_list('image', flat=True).distinct()
+                [:options['batch_size']]
+            )
+            if not names:
+                break
+            last_name = names[-1]
+
+            targets = []
+            for name in names:
+                path = default_storage.path(name)
+                if not os.path.exists(path):
+                    missing += 1
+                    self.stderr.write(f'{name} missing.')
+                    continue
+                with open(path, 'rb') as f:
+                    digest = file_digest(f)
+                extension = os.path.splitext(name)[1].lower()
+                target = sharded_image_path(f'{digest}{extension}')
+                targets.append((name, path, target))
+
+            linked = []
+            with transaction.atomic():
+                # Unused targets cannot be deleted while they are reused.
+                lock_images(target for _, _, target in targets)
+                for name, path, target in targets:
+                    duplicate = default_storage.exists(target)
+                    if not duplicate:
+                        link_file(path, default_storage.path(target))
+                    linked.append((name, target, duplicate))
+                    recipes = Recipe.objects.filter(image=name)
+                    user_ids = recipes.values_list('user_id', flat=True)
+                    for user_id in set(user_ids):
+                        bump_generation(user_id)
+                    # Identical images share renditions, see render_recipe.
+                    rendered = Recipe.objects.filter(
+                        image__in=[target, name],
+                        image_renditions__isnull=False,
+                    ).values_list('image_renditions', flat=True).first()
+                    recipes.update(
+                        image=target,
+                        image_renditions=link_renditions(rendered, target),
+                        updated_at=Now(),
+                    )
+
+            for name, target, duplicate in linked:
+                if image_references(name):
+                    continue
+                if duplicate:
+                    duplicates += 1
+                    reclaimed += default_storage.size(name)
+                renamed += 1
+                for file_name in image_files(name):
+                    default_storage.delete(file_name)
+            self.stdout.write(f'{renamed} images renamed')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Renamed {renamed} images, {duplicates} were duplicates; '
+            f'reclaimed {reclaimed} bytes, {missing} files were missing.'
+        ))
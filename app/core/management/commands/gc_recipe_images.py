@@ -0,0 +1,225 @@
+"""
+Django command to delete recipe images no recipe refers to.
+"""
+import glob
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Collate
+
+from core.models import Recipe
+from core.storage import lock_images
+from recipe.renditions import ROOT, image_files, parse_rendition_name
+
+UPLOAD_ROOT = 'uploads/recipe'
+RENDITION_ROOT = f'{ROOT}/{UPLOAD_ROOT}'
+
+
+def iter_files(path, name):
+    """Yield (name, entry) of the files under path, ordered by name.
+
+    Directories sort as if their name ended in '/', which makes the walk
+    order match the byte order of the full names.
+    """
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: (
+        f'{entry.name}/' if entry.is_dir(follow_symlinks=False)
+        else entry.name
+    ))
+    for entry in entries:
+        entry_name = f'{name}/{entry.name}'
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_files(entry.path, entry_name)
+        elif entry.is_file(follow_symlinks=False):
+            yield entry_name, entry
+
+
+def iter_orphans(files, names):
+    """Yield the files missing from names; both are sorted by name."""
+    names = iter(names)
+    current = next(names, None)
+    for name, entry in files:
+        while current is not None and current < name:
+            current = next(names, None)
+        if current != name:
+            yield name, entry
+
+
+def image_stem(name):
+    """Return the image name, without extension, of a rendition name.
+
+    Names the renditions module did not build give None.
+    """
+    if parse_rendition_name(name) is None:
+        return None
+    stem = os.path.splitext(name)[0].rpartition('_')[0]
+    return stem[len(ROOT) + 1:]
+
+
+def orphaned_renditions(names):
+    """Return the renditions in names of images that are gone.
+
+    Those are renditions no recipe image has, see `image_files`, and
+    whose image file no longer exists; renditions of stored images are
+    left to the image walk.
+    """
+    stems = {name: image_stem(name) for name in names}
+    stems = {name: stem for name, stem in stems.items() if stem}
+    if not stems:
+        return []
+    # Images named stem.ext sort between the stem and stem + '/'.
+    used = Recipe.objects.annotate(name=Collate('image', 'C')).filter(
+        name__gte=min(stems.values()), name__lt=f'{max(stems.values())}/',
+    ).values_list('name', flat=True).distinct()
+    live = {
+        rendition for name in used.iterator()
+        for rendition in image_files(name)
+    }
+    return [
+        name for name, stem in stems.items()
+        if name not in live
+        and not glob.glob(f'{glob.escape(default_storage.path(stem))}.*')
+    ]
+
+
+def _remove(name, dry_run=False):
+    """Delete an image and its renditions, return the bytes freed."""
+    freed = 0
+    for file_name in image_files(name):
+        try:
+            freed += default_storage.size(file_name)
+        except FileNotFoundError:
+            continue
+        if not dry_run:
+            default_storage.delete(file_name)
+    return freed
+
+
+def _remove_rendition(name, cutoff, dry_run=False):
+    """Delete a rendition not rewritten since cutoff, return the bytes
+    freed."""
+    try:
+        stat = os.stat(default_storage.path(name))
+    except FileNotFoundError:
+        return 0
+    if stat.st_mtime >= cutoff:
+        return 0
+    if not dry_run:
+        default_storage.delete(name)
+    return stat.st_size
+
+
+class Command(BaseCommand):
+    """Delete files under uploads/recipe/ that no Recipe.image uses,
+    and renditions left behind by deleted images."""
+    help = (
+        'Delete recipe images, and their renditions, that no recipe uses. '
+        'The files and the Recipe.image values are both streamed in name '
+        'order and merged, so memory use does not grow with the number '
+        'of images. Renditions whose image file is gone are deleted too.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report orphaned files without deleting them.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Only delete files older than this many seconds, which '
+                 'protects uploads that are not committed yet.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of orphans checked and deleted at a time.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Number of threads deleting files.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive.')
+
+        # Python compares str by code point, like the "C" collation.
+        names = Recipe.objects.filter(
+            image__startswith=f'{UPLOAD_ROOT}/',
+        ).annotate(
+            name=Collate('image', 'C'),
+        ).order_by('name').values_list('name', flat=True).distinct()
+        files = iter_files(default_storage.path(UPLOAD_ROOT), UPLOAD_ROOT)
+        cutoff = time.time() - options['min_age']
+        orphans = (
+            name for name, entry in iter_orphans(
+                files, names.iterator(chunk_size=options['batch_size']),
+            )
+            if entry.stat(follow_symlinks=False).st_mtime < cutoff
+        )
+
+        deleted = reclaimed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch = list(itertools.islice(orphans, options['batch_size']))
+                if not batch:
+                    break
+                # Uploads may have reused a file since the walk started;
+                # the locks hold new ones back until the files are gone.
+                with transaction.atomic():
+                    lock_images(batch)
+                    used = set(Recipe.objects.filter(
+                        image__in=batch,
+                    ).values_list('image', flat=True))
+                    batch = [name for name in batch if name not in used]
+                    reclaimed += sum(pool.map(
+                        partial(_remove, dry_run=options['dry_run']), batch,
+                    ))
+                deleted += len(batch)
+
+            renditions, freed = self._gc_renditions(pool, cutoff, options)
+            reclaimed += freed
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} orphaned images and {renditions} orphaned '
+            f'renditions, reclaiming {reclaimed} bytes.'
+        ))
+
+    def _gc_renditions(self, pool, cutoff, options):
+        """Delete renditions of images that are gone, return the number
+        deleted and the bytes freed."""
+        files = (
+            name for name, entry in iter_files(
+                default_storage.path(RENDITION_ROOT), RENDITION_ROOT,
+            )
+            if entry.stat(follow_symlinks=False).st_mtime < cutoff
+        )
+        deleted = reclaimed = 0
+        while True:
+            batch = list(itertools.islice(files, options['batch_size']))
+            if not batch:
+                break
+            # Renditions are written after the image is committed, so a
+            # recent upload shows up here or in the mtime re-checked on
+            # removal.
+            batch = orphaned_renditions(batch)
+            freed = pool.map(
+                partial(
+                    _remove_rendition, cutoff=cutoff,
+                    dry_run=options['dry_run'],
+                ),
+                batch,
+            )
+            reclaimed += sum(freed)
+            deleted += len(batch)
+        return deleted, reclaimed
@@ -0,0 +1,335 @@
+"""
+Django command to bulk import recipes from a JSONL or CSV file.
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Recipe
+from recipe.cache import bump_generation
+
+FORMATS = ('jsonl', 'csv')
+
+STAGE_RECIPE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS import_recipe_stage (
+    record_no bigint NOT NULL,
+    recipe_id bigint,
+    title varchar(255) NOT NULL,
+    "desc" text NOT NULL,
+    time_minutes integer NOT NULL,
+    price numeric(5, 2) NOT NULL,
+    link varchar(255) NOT NULL
+)
+"""
+
+STAGE_ATTR_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS import_recipe_attr_stage (
+    record_no bigint NOT NULL,
+    kind varchar(16) NOT NULL,
+    name varchar(255) NOT NULL
+)
+"""
+
+ASSIGN_IDS_SQL = """
+UPDATE import_recipe_stage
+SET recipe_id = nextval(pg_get_serial_sequence('core_recipe', 'id'))
+"""
+
+MERGE_RECIPES_SQL = """
+INSERT INTO core_recipe
+    (id, user_id, title, "desc", time_minutes, price, link, updated_at)
+SELECT recipe_id, %s, title, "desc", time_minutes, price, link, now()
+FROM import_recipe_stage
+ORDER BY record_no
+"""
+
+MERGE_ATTRS_SQL = """
+INSERT INTO {table} (user_id, name, updated_at)
+SELECT DISTINCT ON (lower(name)) %s, name, now()
+FROM import_recipe_attr_stage
+WHERE kind = %s
+ORDER BY lower(name), record_no
+ON CONFLICT (user_id, lower(name)) DO NOTHING
+"""
+
+MERGE_LINKS_SQL = """
+INSERT INTO {through} (recipe_id, {column})
+SELECT s.recipe_id, t.id
+FROM import_recipe_attr_stage a
+JOIN import_recipe_stage s ON s.record_no = a.record_no
+JOIN {table} t ON t.user_id = %s AND lower(t.name) = lower(a.name)
+WHERE a.kind = %s
+ON CONFLICT DO NOTHING
+"""
+
+
+def _names(value, separator):
+    """Return attribute names from a list of names/dicts or a string."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(separator)
+
+    names = []
+    for item in value:
+        name = item['name'] if isinstance(item, dict) else item
+        name = str(name).strip()
+        if name:
+            names.append(name)
+    return names
+
+
+def clean_record(record, separator='|'):
+    """Validate a raw record and return (recipe row, tags, ingredients)."""
+    title = (record.get('title') or '').strip()
+    if not title or len(title) > 255:
+        raise ValueError('title is required and at most 255 characters')
+    link = record.get('link') or ''
+    if len(link) > 255:
+        raise ValueError('link must be at most 255 characters')
+    try:
+        time_minutes = int(record.get('time_minutes'))
+        price = Decimal(str(record.get('price'))).quantize(Decimal('0.01'))
+        if not price.is_finite():
+            raise ValueError('price is not finite')
+    except (TypeError, ValueError, InvalidOperation):
+        raise ValueError('time_minutes and price must be numbers')
+    if not -2 ** 31 <= time_minutes < 2 ** 31 or abs(price) >= 1000:
+        raise ValueError('time_minutes or price out of range')
+
+    tags = _names(record.get('tags'), separator)
+    ingredients = _names(record.get('ingredients'), separator)
+    if any(len(name) > 255 for name in tags + ingredients):
+        raise ValueError('tag and ingredient names are at most 255 chars')
+
+    row = [title, record.get('desc') or '', time_minutes, price, link]
+    return row, tags, ingredients
+
+
+class Command(BaseCommand):
+    """Stream recipes from a file into a user's account with COPY."""
+    help = (
+        'Import recipes for a user from a JSONL or CSV file. Records are '
+        'copied into staging tables in batches and merged with set-based '
+        'inserts. CSV files need a header row; tags and ingredients are '
+        'separated by --separator.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument(
+            '--user', required=True,
+            help='Email of the user who will own the recipes.',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='File format, guessed from the extension by default.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of records merged per transaction.',
+        )
+        parser.add_argument(
+            '--separator', default='|',
+            help='Separator of tag/ingredient names in CSV files.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Checkpoint file, defaults to <path>.checkpoint.',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Skip the records already imported according to the '
+                 'checkpoint file.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.')
+        if fmt not in FORMATS:
+            raise CommandError(f'Unsupported format "{fmt}".')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email "{options["user"]}".')
+
+        self.user_id = user.id
+        self.separator = options['separator']
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        done = self._read_checkpoint(checkpoint) if options['resume'] else 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(STAGE_RECIPE_SQL)
+            cursor.execute(STAGE_ATTR_SQL)
+
+        imported = skipped = 0
+        started = time.monotonic()
+        with open(path, newline='', encoding='utf-8') as stream:
+            records = self._read_records(stream, fmt)
+            # Already imported records are read again but not merged.
+            records = itertools.islice(records, done, None)
+            record_no = done
+            while True:
+                batch = list(itertools.islice(records, options['batch_size']))
+                if not batch:
+                    break
+                count, errors = self._import_batch(
+                    batch, record_no, checkpoint,
+                )
+                record_no += len(batch)
+                imported += count
+                skipped += errors
+                self._write_checkpoint(checkpoint, record_no)
+                self._report(imported, started)
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        if imported:
+            bump_generation(self.user_id)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipes in {elapsed:.1f}s '
+            f'({imported / max(elapsed, 1e-6):.0f} rows/s), '
+            f'skipped {skipped} invalid records.'
+        ))
+
+    def _read_records(self, stream, fmt):
+        """Yield raw records from stream one at a time."""
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield {}
+
+    def _import_batch(self, batch, first_record_no, checkpoint):
+        """Copy a batch into the staging tables and merge it.
+
+        The checkpoint is written as pending before the transaction
+        commits, see `_read_checkpoint`.
+        """
+        recipes = io.StringIO()
+        attrs = io.StringIO()
+        recipe_writer = csv.writer(recipes)
+        attr_writer = csv.writer(attrs)
+        count = 0
+        for record_no, record in enumerate(batch, start=first_record_no + 1):
+            try:
+                row, tags, ingredients = clean_record(record, self.separator)
+            except (AttributeError, ValueError) as exc:
+                self.stderr.write(f'Record {record_no} skipped: {exc}')
+                continue
+            count += 1
+            recipe_writer.writerow([record_no] + row)
+            attr_writer.writerows(
+                [record_no, 'tag', name] for name in tags
+            )
+            attr_writer.writerows(
+                [record_no, 'ingredient', name] for name in ingredients
+            )
+        recipes.seek(0)
+        attrs.seek(0)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'TRUNCATE import_recipe_stage, import_recipe_attr_stage'
+            )
+            cursor.copy_expert(
+                'COPY import_recipe_stage '
+                '(record_no, title, "desc", time_minutes, price, link) '
+                'FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ("desc", link))',
+                recipes,
+            )
+            cursor.copy_expert(
+                'COPY import_recipe_attr_stage (record_no, kind, name) '
+                'FROM STDIN WITH (FORMAT csv)',
+                attrs,
+            )
+            # Temp tables are never auto-analyzed; give the planner stats.
+            cursor.execute(
+                'ANALYZE import_recipe_stage, import_recipe_attr_stage'
+            )
+            cursor.execute(ASSIGN_IDS_SQL)
+            cursor.execute('SELECT max(recipe_id) FROM import_recipe_stage')
+            last_recipe_id = cursor.fetchone()[0]
+            cursor.execute(MERGE_RECIPES_SQL, [self.user_id])
+            for kind, field_name in [
+                    ('tag', 'tags'), ('ingredient', 'ingredients')]:
+                field = Recipe._meta.get_field(field_name)
+                through = field.remote_field.through._meta
+                table = field.related_model._meta.db_table
+                cursor.execute(
+                    MERGE_ATTRS_SQL.format(table=table),
+                    [self.user_id, kind],
+                )
+                cursor.execute(
+                    MERGE_LINKS_SQL.format(
+                        through=through.db_table,
+                        column=f'{field.m2m_reverse_field_name()}_id',
+                        table=table,
+                    ),
+                    [self.user_id, kind],
+                )
+            self._write_checkpoint(checkpoint, first_record_no, pending={
+                'records': first_record_no + len(batch),
+                'recipe_id': last_recipe_id,
+            })
+
+        return count, len(batch) - count
+
+    def _report(self, imported, started):
+        """Write import progress."""
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{imported} recipes imported '
+            f'({imported / max(elapsed, 1e-6):.0f} rows/s)'
+        )
+
+    def _read_checkpoint(self, checkpoint):
+        """Return the number of records already processed.
+
+        A pending batch counts as processed when its last recipe exists,
+        i.e. when its transaction committed.
+        """
+        try:
+            with open(checkpoint) as f:
+                state = json.load(f)
+            records = int(state['records'])
+            pending = state.get('pending')
+            if pending is not None:
+                recipe_id = pending['recipe_id']
+                if recipe_id is None or Recipe.objects.filter(
+                        id=recipe_id).exists():
+                    records = int(pending['records'])
+        except FileNotFoundError:
+            return 0
+        except (ValueError, KeyError, TypeError):
+            raise CommandError(f'Invalid checkpoint file "{checkpoint}".')
+        return records
+
+    def _write_checkpoint(self, checkpoint, records, pending=None):
+        """Atomically record the number of processed records, and the
+        batch about to be committed if any."""
+        state = {'records': records}
+        if pending is not None:
+            state['pending'] = pending
+        tmp_path = f'{checkpoint}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, checkpoint)
@@ -0,0 +1,100 @@
+"""
+Django command to move recipe images into sharded directories.
+"""
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Now
+
+from core.models import Recipe
+from core.storage import link_file, sharded_image_path
+from recipe.cache import bump_generation
+from recipe.renditions import image_files, link_renditions
+
+# Images stored directly in uploads/recipe/, before sharding.
+UNSHARDED_RE = r'^uploads/recipe/[^/]+$'
+
+
+class Command(BaseCommand):
+    """Move flat recipe images to uploads/recipe/ab/cd/<name>."""
+    help = (
+        'Move recipe images stored directly under uploads/recipe/ into '
+        'sharded directories, rewriting Recipe.image in batches. Files '
+        'are hard linked before the rows change and unlinked after, so '
+        'images stay reachable throughout. The command can be stopped '
+        'and run again at any time. Renditions are linked along; those '
+        'with missing files are reset for backfill_renditions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of recipes rewritten per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        moved = missing = 0
+        last_id = 0
+        while True:
+            # Rows already moved no longer match, so a rerun resumes.
+            batch = list(
+                Recipe.objects.filter(
+                    id__gt=last_id, image__regex=UNSHARDED_RE,
+                ).order_by('id').values_list(
+                    'id', 'user_id', 'image', 'image_renditions',
+                )[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            linked = []
+            for recipe_id, user_id, name, renditions in batch:
+                new_name = sharded_image_path(os.path.basename(name))
+                if self._link(name, new_name):
+                    linked.append((
+                        recipe_id, user_id, name, new_name,
+                        link_renditions(renditions, new_name),
+                    ))
+                else:
+                    missing += 1
+                    self.stderr.write(f'Recipe {recipe_id}: {name} missing.')
+
+            done = []
+            with transaction.atomic():
+                for recipe_id, user_id, name, new_name, renditions in linked:
+                    updated = Recipe.objects.filter(
+                        id=recipe_id, image=name,
+                    ).update(
+                        image=new_name, image_renditions=renditions,
+                        updated_at=Now(),
+                    )
+                    done.append((name, new_name, updated))
+                    if updated:
+                        bump_generation(user_id)
+
+            for name, new_name, updated in done:
+                # A concurrent upload replaced the image, drop the copy.
+                for file_name in image_files(name if updated else new_name):
+                    default_storage.delete(file_name)
+            moved += sum(updated for _, _, updated in done)
+            self.stdout.write(f'{moved} images moved')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} images, {missing} files were missing.'
+        ))
+
+    def _link(self, name, new_name):
+        """Make new_name refer to the file name, return False if missing."""
+        path = default_storage.path(name)
+        new_path = default_storage.path(new_name)
+        if not os.path.exists(path):
+            return False
+        link_file(path, new_path)
+        return True
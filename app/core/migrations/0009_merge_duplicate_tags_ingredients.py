@@ -0,0 +1,73 @@
+"""
+Merge tags and ingredients whose names only differ by case, ahead of the
+per-user unique constraint added in 0010.
+"""
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+
+def merge_duplicates(model, through, fk_name):
+    """Repoint links of duplicate rows onto the oldest row and drop them."""
+    groups = model.objects.annotate(
+        lower_name=Lower('name'),
+    ).values('user_id', 'lower_name').annotate(
+        keep_id=Min('id'),
+        total=Count('id'),
+    ).filter(total__gt=1)
+
+    for group in groups.iterator():
+        keep_id = group['keep_id']
+        dup_ids = list(
+            model.objects.annotate(lower_name=Lower('name')).filter(
+                user_id=group['user_id'],
+                lower_name=group['lower_name'],
+            ).exclude(id=keep_id).values_list('id', flat=True)
+        )
+        linked_recipes = through.objects.filter(
+            **{fk_name: keep_id}
+        ).values('recipe_id')
+        # Links that would duplicate an existing link to the kept row.
+        through.objects.filter(
+            **{f'{fk_name}__in': dup_ids},
+            recipe_id__in=linked_recipes,
+        ).delete()
+        # A recipe may still be linked to several duplicates.
+        seen = set()
+        for link in through.objects.filter(
+                **{f'{fk_name}__in': dup_ids}).order_by('id'):
+            if link.recipe_id in seen:
+                link.delete()
+                continue
+            seen.add(link.recipe_id)
+            setattr(link, fk_name, keep_id)
+            link.save(update_fields=[fk_name])
+        model.objects.filter(id__in=dup_ids).delete()
+
+
+def merge_tags_and_ingredients(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    merge_duplicates(
+        apps.get_model('core', 'Tag'),
+        Recipe.tags.through,
+        'tag_id',
+    )
+    merge_duplicates(
+        apps.get_model('core', 'Ingredient'),
+        Recipe.ingredients.through,
+        'ingredient_id',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_tags_and_ingredients,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_signed_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions',
+            field=models.JSONField(editable=False, null=True),
+        ),
+    ]
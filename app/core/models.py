@@ -5,17 +5,20 @@ import uuid
 import os
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, \
     PermissionsMixin, BaseUserManager
 
+from core.storage import ContentAddressedStorage, sharded_image_path
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for a new recipe image."""
     file_extension = os.path.splitext(filename)[1]
     filename = f'{uuid.uuid4()}{file_extension}'
-    # print(os.path.join('uploads', 'recipe', filename))
-    return os.path.join('uploads', 'recipe', filename)
+    return sharded_image_path(filename)
 
 
 class UserManager(BaseUserManager):
@@ -49,12 +52,35 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Signed access and refresh tokens issued before this are rejected.
+    tokens_valid_after = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
 
+class RefreshToken(models.Model):
+    """Model for tokens exchanged for signed access tokens"""
+    key = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='refresh_tokens',
+        on_delete=models.CASCADE,
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
+
+class RecipeManager(models.Manager):
+    """Manager for Recipe which leaves the search vector unloaded."""
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     """Model for recipe"""
     user = models.ForeignKey(
@@ -68,7 +94,36 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Identical images share one file, see core.storage.
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage(),
+    )
+    # {size: {format: storage name}}, written by recipe.renditions.
+    image_renditions = models.JSONField(null=True, editable=False)
+    # Maintained from title and desc by a database trigger, see 0011.
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'],
+                name='core_recipe_user_id_desc_idx',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='core_recipe_search_gin_idx',
+            ),
+            models.Index(fields=['image'], name='core_recipe_image_idx'),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_recipe_user_updated_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -81,6 +136,22 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # (user, lower(name)) is also unique; Django 3.2 cannot express
+        # functional unique constraints, see migration 0010.
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                name='core_tag_user_name_idx',
+            ),
+            GinIndex(
+                fields=['name'],
+                name='core_tag_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -93,6 +164,22 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # (user, lower(name)) is also unique; Django 3.2 cannot express
+        # functional unique constraints, see migration 0010.
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                name='core_ingredient_user_name_idx',
+            ),
+            GinIndex(
+                fields=['name'],
+                name='core_ingredient_name_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ]
 
     def __str__(self):
         return self.name
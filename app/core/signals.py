@@ -0,0 +1,39 @@
+"""
+Signal handlers keeping Recipe.updated_at current.
+"""
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPE_FIELDS = {Tag: 'tags', Ingredient: 'ingredients'}
+
+
+def touch_recipes(**lookups):
+    """Set updated_at of the matching recipes to now."""
+    Recipe.objects.filter(**lookups).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_of_attr(sender, instance, created=False, **kwargs):
+    """Touch recipes showing a renamed or deleted tag/ingredient."""
+    if not created:
+        touch_recipes(**{RECIPE_FIELDS[sender]: instance})
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipes_on_links(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Touch recipes whose tags or ingredients changed."""
+    if not reverse:
+        if action.startswith('post_'):
+            touch_recipes(pk=instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(pk__in=pk_set)
+    elif action == 'pre_clear':
+        touch_recipes(**{RECIPE_FIELDS[type(instance)]: instance})
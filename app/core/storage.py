@@ -0,0 +1,93 @@
+"""
+Content-addressed storage of recipe images.
+"""
+import hashlib
+import os
+import shutil
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+LOCK_IMAGES_SQL = """
+SELECT pg_advisory_xact_lock(hashtext(name))
+FROM unnest(%s::text[]) WITH ORDINALITY AS t(name, position)
+ORDER BY position
+"""
+
+
+def sharded_image_path(filename):
+    """Return the path of a recipe image, sharded by its name prefix."""
+    return os.path.join(
+        'uploads', 'recipe', filename[:2], filename[2:4], filename,
+    )
+
+
+def file_digest(content):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in iter(lambda: content.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def lock_images(names):
+    """Lock image names until the current transaction ends.
+
+    Storing an image and deleting an unused one both lock its name, so
+    an upload reusing a stored file either commits its reference before
+    the delete checks for one, or stores the file again after it. Names
+    are locked in sorted order, so callers locking several of them cannot
+    deadlock each other.
+    """
+    names = sorted(set(names))
+    if names:
+        with connection.cursor() as cursor:
+            cursor.execute(LOCK_IMAGES_SQL, [names])
+
+
+def link_file(path, new_path):
+    """Make new_path refer to the file at path, without moving it."""
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    try:
+        os.link(path, new_path)
+    except FileExistsError:
+        if not os.path.samefile(path, new_path):
+            shutil.copyfile(path, new_path)
+    except OSError:
+        # Hard links need both names on one file system.
+        shutil.copyfile(path, new_path)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Store each distinct file once, named by the hash of its content.
+
+    Uploads carrying a `sha256` attribute (set by
+    `recipe.uploads.ImageUploadHandler`) are not read again. Files are
+    shared by every recipe using the same image, so they may only be
+    deleted once no `Recipe.image` refers to them. Saves must run in the
+    transaction storing the reference, see `lock_images`.
+    """
+
+    def _save(self, name, content):
+        digest = getattr(content, 'sha256', None) or file_digest(content)
+        extension = os.path.splitext(name)[1].lower()
+        name = sharded_image_path(f'{digest}{extension}')
+        lock_images([name])
+        if self.exists(name):
+            # A reused file is new again for gc_recipe_images --min-age.
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+
+def image_references(name):
+    """Return the number of recipes using the image file name."""
+    from core.models import Recipe
+
+    return Recipe.objects.filter(image=name).count()
@@ -1,12 +1,27 @@
 """
 Test Custom Django Management Commands
 """
+import hashlib
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
 
 from unittest.mock import patch
 from psycopg2 import OperationalError as pg_op_error
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.management.commands import import_recipes
+from core.models import Recipe, Tag, Ingredient
+from recipe import renditions
 
 
 @patch("core.management.commands.wait_for_db.Command.check")
@@ -32,3 +47,450 @@ class CommandTest(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class ImportRecipesCommandTest(TestCase):
+    """Test the import_recipes command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testing1q2w3e',
+        )
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, content):
+        """Write content to a file in the temp dir and return its path."""
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_import_jsonl(self):
+        """Test importing recipes with tags and ingredients from JSONL."""
+        Tag.objects.create(user=self.user, name='Lunch')
+        records = [
+            {
+                'title': f'Recipe {i}', 'time_minutes': 10, 'price': '2.50',
+                'tags': ['lunch', f'Tag {i % 2}'],
+                'ingredients': [{'name': 'Salt'}],
+            }
+            for i in range(5)
+        ]
+        path = self._write(
+            'recipes.jsonl', '\n'.join(json.dumps(r) for r in records)
+        )
+
+        call_command(
+            'import_recipes', path, user=self.user.email, batch_size=2,
+            stdout=StringIO(),
+        )
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [r.title for r in recipes], [r['title'] for r in records]
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        for recipe in recipes:
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.price, Decimal('2.50'))
+            self.assertEqual(recipe.ingredients.get().name, 'Salt')
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+    def test_import_csv_skips_invalid_records(self):
+        """Test importing from CSV reports and skips invalid records."""
+        path = self._write(
+            'recipes.csv',
+            'title,desc,time_minutes,price,link,tags,ingredients\n'
+            'Soup,"Hot, tasty",15,1.25,,Dinner|Warm,Water\n'
+            ',missing title,5,1.00,,,\n'
+            'Salad,,abc,1.00,,,\n'
+        )
+        stderr = StringIO()
+
+        call_command(
+            'import_recipes', path, user=self.user.email,
+            stdout=StringIO(), stderr=stderr,
+        )
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.desc, 'Hot, tasty')
+        self.assertEqual(
+            sorted(t.name for t in recipe.tags.all()), ['Dinner', 'Warm']
+        )
+        self.assertIn('Record 2 skipped', stderr.getvalue())
+        self.assertIn('Record 3 skipped', stderr.getvalue())
+
+    def test_import_resume_from_checkpoint(self):
+        """Test resuming skips records recorded in the checkpoint."""
+        records = [
+            {'title': f'Recipe {i}', 'time_minutes': 1, 'price': 1}
+            for i in range(4)
+        ]
+        path = self._write(
+            'recipes.jsonl', '\n'.join(json.dumps(r) for r in records)
+        )
+        self._write('recipes.jsonl.checkpoint', json.dumps({'records': 3}))
+
+        call_command(
+            'import_recipes', path, user=self.user.email, resume=True,
+            stdout=StringIO(),
+        )
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Recipe 3')
+
+    def test_import_skips_non_finite_prices(self):
+        """Test NaN and infinite prices skip the record only."""
+        records = [
+            {'title': 'Soup', 'time_minutes': 1, 'price': 'NaN'},
+            {'title': 'Stew', 'time_minutes': 1, 'price': 'sNaN'},
+            {'title': 'Pie', 'time_minutes': 1, 'price': 'Infinity'},
+            {'title': 'Salad', 'time_minutes': 1, 'price': '1.00'},
+        ]
+        path = self._write(
+            'recipes.jsonl', '\n'.join(json.dumps(r) for r in records)
+        )
+        stderr = StringIO()
+
+        call_command(
+            'import_recipes', path, user=self.user.email,
+            stdout=StringIO(), stderr=stderr,
+        )
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Salad')
+        for record_no in range(1, 4):
+            self.assertIn(f'Record {record_no} skipped', stderr.getvalue())
+
+    def test_import_resume_after_commit_before_checkpoint(self):
+        """Test a batch committed but not checkpointed is not imported
+        twice."""
+        records = [
+            {'title': f'Recipe {i}', 'time_minutes': 1, 'price': 1}
+            for i in range(4)
+        ]
+        path = self._write(
+            'recipes.jsonl', '\n'.join(json.dumps(r) for r in records)
+        )
+
+        write_checkpoint = import_recipes.Command._write_checkpoint
+
+        def crash_after_commit(self, checkpoint, records, pending=None):
+            if pending is None:
+                raise KeyboardInterrupt
+            write_checkpoint(self, checkpoint, records, pending)
+
+        with patch.object(import_recipes.Command, '_write_checkpoint',
+                          crash_after_commit):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    'import_recipes', path, user=self.user.email,
+                    batch_size=2, stdout=StringIO(),
+                )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+        call_command(
+            'import_recipes', path, user=self.user.email, batch_size=2,
+            resume=True, stdout=StringIO(),
+        )
+
+        self.assertEqual(
+            sorted(Recipe.objects.filter(
+                user=self.user,
+            ).values_list('title', flat=True)),
+            [r['title'] for r in records],
+        )
+
+    def test_import_resume_rolled_back_batch(self):
+        """Test a pending batch which never committed is imported."""
+        records = [
+            {'title': f'Recipe {i}', 'time_minutes': 1, 'price': 1}
+            for i in range(2)
+        ]
+        path = self._write(
+            'recipes.jsonl', '\n'.join(json.dumps(r) for r in records)
+        )
+        self._write('recipes.jsonl.checkpoint', json.dumps({
+            'records': 1, 'pending': {'records': 2, 'recipe_id': 10 ** 9},
+        }))
+
+        call_command(
+            'import_recipes', path, user=self.user.email, resume=True,
+            stdout=StringIO(),
+        )
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Recipe 1')
+
+    def test_import_unknown_user(self):
+        """Test importing for an unknown user fails."""
+        path = self._write('recipes.jsonl', '')
+
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', path, user='nobody@example.com')
+
+
+class MediaCommandTestCase(TestCase):
+    """Base class for tests of commands rewriting recipe images."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testing1q2w3e',
+        )
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.override = override_settings(MEDIA_ROOT=self.tmp_dir.name)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.tmp_dir.cleanup()
+
+    def _recipe(self, name, content=b'image'):
+        """Create a recipe using a flat image file and return it."""
+        if content is not None:
+            path = os.path.join(self.tmp_dir.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+        return Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('5.50'), image=name,
+        )
+
+    def _rendered_recipe(self, name, content=b'image'):
+        """Create a recipe with an image and renditions of it."""
+        recipe = self._recipe(name, content)
+        recipe.image_renditions = {
+            size: {fmt: renditions.rendition_name(name, size, fmt)}
+            for size in renditions.SIZES for fmt in ['jpeg']
+        }
+        recipe.save()
+        for names in recipe.image_renditions.values():
+            for rendition in names.values():
+                default_storage.save(rendition, ContentFile(b'rendition'))
+        return recipe
+
+    def assertRenditionsStored(self, recipe):
+        """Assert the renditions of recipe belong to its image and exist."""
+        recipe.refresh_from_db()
+        for size, names in recipe.image_renditions.items():
+            for fmt, name in names.items():
+                self.assertEqual(
+                    name,
+                    renditions.rendition_name(recipe.image.name, size, fmt),
+                )
+                self.assertTrue(default_storage.exists(name))
+
+
+class ShardRecipeImagesCommandTest(MediaCommandTestCase):
+    """Test the shard_recipe_images command."""
+
+    def test_shard_images(self):
+        """Test flat images are moved and recipes rewritten."""
+        recipes = [
+            self._recipe(f'uploads/recipe/ab12-{i}.jpg') for i in range(3)
+        ]
+        missing = self._recipe('uploads/recipe/cd34.jpg', content=None)
+        sharded = self._recipe('uploads/recipe/ef/56/ef56.jpg')
+        out = StringIO()
+
+        call_command(
+            'shard_recipe_images', batch_size=2, stdout=out, stderr=StringIO(),
+        )
+
+        self.assertIn('Moved 3 images, 1 files were missing', out.getvalue())
+        for recipe in recipes:
+            old_name = recipe.image.name
+            recipe.refresh_from_db()
+            self.assertEqual(
+                recipe.image.name,
+                f'uploads/recipe/ab/12/{os.path.basename(old_name)}',
+            )
+            with recipe.image.open() as f:
+                self.assertEqual(f.read(), b'image')
+            self.assertFalse(
+                os.path.exists(os.path.join(self.tmp_dir.name, old_name))
+            )
+        missing.refresh_from_db()
+        self.assertEqual(missing.image.name, 'uploads/recipe/cd34.jpg')
+        sharded.refresh_from_db()
+        self.assertEqual(sharded.image.name, 'uploads/recipe/ef/56/ef56.jpg')
+
+    def test_shard_images_with_renditions(self):
+        """Test renditions are moved along and survive a GC."""
+        recipe = self._rendered_recipe('uploads/recipe/ab12.jpg')
+        old_names = [
+            name for names in recipe.image_renditions.values()
+            for name in names.values()
+        ]
+        lost = self._rendered_recipe('uploads/recipe/cd34.jpg')
+        default_storage.delete(
+            lost.image_renditions['thumbnail']['jpeg'],
+        )
+
+        call_command('shard_recipe_images', stdout=StringIO())
+        call_command('gc_recipe_images', min_age=0, stdout=StringIO())
+
+        self.assertRenditionsStored(recipe)
+        self.assertFalse(any(map(default_storage.exists, old_names)))
+        lost.refresh_from_db()
+        self.assertEqual(lost.image.name, 'uploads/recipe/cd/34/cd34.jpg')
+        self.assertIsNone(lost.image_renditions)
+
+    def test_resume_after_link(self):
+        """Test a run interrupted after linking files completes."""
+        recipe = self._recipe('uploads/recipe/ab12.jpg')
+        new_path = os.path.join(self.tmp_dir.name, 'uploads/recipe/ab/12')
+        os.makedirs(new_path)
+        os.link(
+            os.path.join(self.tmp_dir.name, 'uploads/recipe/ab12.jpg'),
+            os.path.join(new_path, 'ab12.jpg'),
+        )
+
+        call_command('shard_recipe_images', stdout=StringIO())
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, 'uploads/recipe/ab/12/ab12.jpg')
+        self.assertTrue(os.path.exists(os.path.join(new_path, 'ab12.jpg')))
+
+
+class DedupRecipeImagesCommandTest(MediaCommandTestCase):
+    """Test the dedup_recipe_images command."""
+
+    def test_dedup_images(self):
+        """Test identical images end up in one content-addressed file."""
+        same = [
+            self._recipe(f'uploads/recipe/same-{i}.JPG') for i in range(3)
+        ]
+        same.append(Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('5.50'), image=same[0].image.name,
+        ))
+        other = self._recipe('uploads/recipe/ab/cd/other.png', b'other')
+        out = StringIO()
+
+        call_command('dedup_recipe_images', batch_size=2, stdout=out)
+
+        digest = hashlib.sha256(b'image').hexdigest()
+        names = {
+            recipe.image.name
+            for recipe in Recipe.objects.filter(id__in=[r.id for r in same])
+        }
+        self.assertEqual(names, {
+            f'uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.jpg',
+        })
+        other.refresh_from_db()
+        digest = hashlib.sha256(b'other').hexdigest()
+        self.assertEqual(
+            other.image.name,
+            f'uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.png',
+        )
+        files = [
+            os.path.join(root, name)
+            for root, _, file_names in os.walk(self.tmp_dir.name)
+            for name in file_names
+        ]
+        self.assertEqual(len(files), 2)
+        self.assertIn('Renamed 4 images, 2 were duplicates', out.getvalue())
+        self.assertIn('reclaimed 10 bytes', out.getvalue())
+
+        out = StringIO()
+        call_command('dedup_recipe_images', stdout=out)
+        self.assertIn('Renamed 0 images', out.getvalue())
+
+    def test_dedup_images_with_renditions(self):
+        """Test renditions are moved along and survive a GC."""
+        recipe = self._rendered_recipe('uploads/recipe/same-1.jpg')
+        old_names = [
+            name for names in recipe.image_renditions.values()
+            for name in names.values()
+        ]
+        unrendered = self._recipe('uploads/recipe/same-2.jpg')
+
+        call_command('dedup_recipe_images', stdout=StringIO())
+        call_command('gc_recipe_images', min_age=0, stdout=StringIO())
+
+        self.assertRenditionsStored(recipe)
+        self.assertFalse(any(map(default_storage.exists, old_names)))
+        unrendered.refresh_from_db()
+        self.assertEqual(unrendered.image, recipe.image)
+        self.assertEqual(
+            unrendered.image_renditions, recipe.image_renditions,
+        )
+
+
+class GcRecipeImagesCommandTest(MediaCommandTestCase):
+    """Test the gc_recipe_images command."""
+
+    def _file(self, name, content=b'image', age=7200):
+        """Write a file of the given age under the media root."""
+        path = os.path.join(self.tmp_dir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_gc_images(self):
+        """Test orphaned images and renditions are deleted."""
+        # Names chosen so that directory and file order differ.
+        used = ['uploads/recipe/a/b.jpg', 'uploads/recipe/a-b.jpg']
+        for name in used:
+            self._recipe(name)
+        orphans = [
+            self._file('uploads/recipe/a.jpg', b'12'),
+            self._file('uploads/recipe/a/a.jpg', b'123'),
+            self._file('renditions/uploads/recipe/a/a_thumbnail.webp', b'4'),
+        ]
+        recent = self._file('uploads/recipe/a/c.jpg', age=0)
+
+        out = StringIO()
+        call_command('gc_recipe_images', dry_run=True, stdout=out)
+        self.assertIn('Would delete 2 orphaned images and 0 orphaned '
+                      'renditions, reclaiming 6 bytes', out.getvalue())
+        self.assertTrue(all(os.path.exists(path) for path in orphans))
+
+        out = StringIO()
+        call_command('gc_recipe_images', batch_size=1, stdout=out)
+        self.assertIn('Deleted 2 orphaned images and 0 orphaned '
+                      'renditions, reclaiming 6 bytes', out.getvalue())
+        self.assertFalse(any(os.path.exists(path) for path in orphans))
+        self.assertTrue(os.path.exists(recent))
+        for name in used:
+            self.assertTrue(
+                os.path.exists(os.path.join(self.tmp_dir.name, name))
+            )
+
+    def test_gc_renditions_of_deleted_images(self):
+        """Test renditions whose image file is gone are deleted."""
+        # A recipe keeps its renditions even if its image file is lost.
+        self._recipe('uploads/recipe/a/b.png', content=None)
+        recent = self._file('uploads/recipe/a/d.jpg', age=0)
+        kept = [
+            self._file('renditions/uploads/recipe/a/d_thumbnail.jpg'),
+            self._file('renditions/uploads/recipe/a/b_thumbnail.jpg'),
+            self._file('renditions/uploads/recipe/a/b_medium.webp'),
+            self._file('renditions/uploads/recipe/a/b_c_thumbnail.jpg', age=0),
+            self._file('renditions/uploads/recipe/a/b_extra.jpg'),
+        ]
+        orphans = [
+            self._file('renditions/uploads/recipe/a/a_thumbnail.jpg', b'12'),
+            self._file('renditions/uploads/recipe/a/b_c_medium.webp', b'3'),
+            self._file('renditions/uploads/recipe/b/b_medium.jpg', b'4'),
+        ]
+
+        out = StringIO()
+        call_command('gc_recipe_images', batch_size=2, stdout=out)
+
+        self.assertIn('Deleted 0 orphaned images and 3 orphaned '
+                      'renditions, reclaiming 4 bytes', out.getvalue())
+        self.assertFalse(any(os.path.exists(path) for path in orphans))
+        self.assertTrue(all(os.path.exists(path) for path in kept))
+        self.assertTrue(os.path.exists(recent))
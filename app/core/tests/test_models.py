@@ -4,6 +4,7 @@ Test for models.
 from unittest.mock import patch
 from decimal import Decimal
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -98,6 +99,54 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_tag_name_unique_per_user_case_insensitive(self):
+        """Test a user cannot have two tags differing only by case."""
+        user = create_user(email="test@example.com", password="test1q2w3e")
+        other_user = create_user(
+            email="other@example.com",
+            password="test1q2w3e",
+        )
+        models.Tag.objects.create(user=user, name='Lunch')
+        models.Tag.objects.create(user=other_user, name='Lunch')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='lunch')
+
+    def test_ingredient_name_unique_per_user_case_insensitive(self):
+        """Test a user cannot have two ingredients differing by case."""
+        user = create_user(email="test@example.com", password="test1q2w3e")
+        models.Ingredient.objects.create(user=user, name='Salt')
+
+        with self.assertRaises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name='SALT')
+
+    def test_recipe_updated_at_follows_links(self):
+        """Test changing recipe tags or renaming a tag touches recipes."""
+        user = create_user(email="test@example.com", password="test1q2w3e")
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Sample Recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        tag = models.Tag.objects.create(user=user, name='Lunch')
+        last = recipe.updated_at
+
+        recipe.tags.add(tag)
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, last)
+        last = recipe.updated_at
+
+        tag.name = 'Dinner'
+        tag.save()
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, last)
+        last = recipe.updated_at
+
+        tag.recipe_set.clear()
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, last)
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test generating image path."""
@@ -105,4 +154,4 @@ class ModelTests(TestCase):
         mock_uuid.return_value = uuid
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
-        self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+        self.assertEqual(file_path, f'uploads/recipe/te/st/{uuid}.jpg')
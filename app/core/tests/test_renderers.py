@@ -0,0 +1,88 @@
+"""
+Test the orjson renderer and parser.
+"""
+import datetime
+import io
+import uuid
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+SAMPLE = {
+    'id': 1,
+    'title': 'Soto ayam \u2028\u2029 é',
+    'price': Decimal('5.50'),
+    'created': datetime.datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc),
+    'naive': datetime.datetime(2024, 1, 2, 3, 4, 5),
+    'date': datetime.date(2024, 1, 2),
+    'duration': datetime.timedelta(minutes=5),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'lazy': _('Sample'),
+    'tags': [ReturnDict({'id': 1, 'name': 'Soup'}, serializer=None)],
+    10: 'int key',
+    'ratio': 0.1,
+    'none': None,
+}
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer."""
+
+    def test_output_matches_json_renderer(self):
+        """Test the output is byte-identical to JSONRenderer."""
+        self.assertEqual(
+            ORJSONRenderer().render(SAMPLE), JSONRenderer().render(SAMPLE),
+        )
+
+    def test_indent_falls_back(self):
+        """Test indented output, used by the browsable API, still works."""
+        expected = JSONRenderer().render(SAMPLE, 'application/json; indent=4')
+
+        rendered = ORJSONRenderer().render(
+            SAMPLE, 'application/json; indent=4',
+        )
+
+        self.assertEqual(rendered, expected)
+        self.assertIn(b'\n    ', rendered)
+
+    def test_big_int_falls_back(self):
+        """Test values orjson cannot encode are rendered by json."""
+        self.assertEqual(ORJSONRenderer().render({'n': 2 ** 70}),
+                         b'{"n":1180591620717411303424}')
+
+    def test_none_renders_empty(self):
+        """Test None renders an empty body."""
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class ORJSONParserTests(SimpleTestCase):
+    """Test the orjson parser."""
+
+    def test_parse(self):
+        """Test JSON is parsed."""
+        data = ORJSONParser().parse(io.BytesIO('{"a": [1, "é"]}'.encode()))
+
+        self.assertEqual(data, {'a': [1, 'é']})
+
+    def test_parse_other_encoding(self):
+        """Test bodies in other charsets are decoded first."""
+        data = ORJSONParser().parse(
+            io.BytesIO('{"a": "é"}'.encode('latin-1')),
+            parser_context={'encoding': 'latin-1'},
+        )
+
+        self.assertEqual(data, {'a': 'é'})
+
+    def test_parse_error(self):
+        """Test invalid JSON and NaN raise ParseError."""
+        for body in [b'{"a": ', b'{"a": NaN}']:
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(body))
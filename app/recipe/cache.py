@@ -0,0 +1,103 @@
+"""
+Per-user versioned cache for Recipe API read responses.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from core.cache import is_shared
+
+KEY_PREFIX = 'recipe-api'
+HITS_KEY = f'{KEY_PREFIX}:hits'
+MISSES_KEY = f'{KEY_PREFIX}:misses'
+
+
+def _generation_key(user_id):
+    return f'{KEY_PREFIX}:gen:{user_id}'
+
+
+def _incr(key):
+    """Increment a counter, creating it if needed."""
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr.
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def get_generation(user_id):
+    """Return the current cache generation of the user."""
+    generation = cache.get(_generation_key(user_id))
+    if generation is None:
+        cache.add(_generation_key(user_id), 0, timeout=None)
+        generation = cache.get(_generation_key(user_id), 0)
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidate every cached response of the user.
+
+    The counter is bumped right away and again once the surrounding
+    transaction commits, so a response cached from a concurrent read of
+    the old data cannot outlive the change.
+    """
+    _incr(_generation_key(user_id))
+    transaction.on_commit(lambda: _incr(_generation_key(user_id)))
+
+
+def cache_stats():
+    """Return the cache hit and miss counts."""
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': counts.get(HITS_KEY, 0),
+        'misses': counts.get(MISSES_KEY, 0),
+    }
+
+
+def response_key(request, generation):
+    """Return the cache key of the response to request."""
+    query = sorted(request.query_params.lists())
+    digest = hashlib.md5(
+        f'{request.get_host()}|{request.path}|{query}'.encode()
+    ).hexdigest()
+    return f'{KEY_PREFIX}:resp:{request.user.id}:{generation}:{digest}'
+
+
+class CachedResponseMixin:
+    """Cache list responses per user and generation. Views may wrap other
+    read actions with `_cached_response`.
+
+    Views using this mixin must call `bump_generation` (directly or
+    through model signals) whenever data visible to the user changes.
+    Responses are only cached when the default cache is shared by all
+    workers, see `core.cache.is_shared`.
+    """
+
+    def _cached_response(self, view_func, request, *args, **kwargs):
+        timeout = settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+        # Other workers would keep serving responses invalidated here.
+        if not timeout or not is_shared():
+            return view_func(request, *args, **kwargs)
+
+        key = response_key(request, get_generation(request.user.id))
+        data = cache.get(key)
+        if data is not None:
+            _incr(HITS_KEY)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _incr(MISSES_KEY)
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
@@ -0,0 +1,70 @@
+"""
+Conditional GET support (ETag / Last-Modified) for Recipe API.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def _etag(*parts):
+    digest = hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+    return f'W/{quote_etag(digest)}'
+
+
+def list_validators(queryset, media_type):
+    """Return (etag, None) of the recipes in queryset, rendered as
+    media_type, from one aggregate query.
+
+    Deleting a recipe other than the newest leaves max(updated_at) as it
+    was, so lists carry no Last-Modified; the ETag covers the count.
+    """
+    stats = queryset.order_by().aggregate(
+        last_modified=Max('updated_at'),
+        count=Count('id'),
+    )
+    last_modified = stats['last_modified']
+    return _etag(
+        media_type, stats['count'],
+        last_modified and last_modified.isoformat(),
+    ), None
+
+
+def detail_validators(queryset, pk, media_type):
+    """Return (etag, last modified) of one recipe rendered as media_type,
+    or (None, None) if it does not exist in queryset."""
+    try:
+        last_modified = queryset.filter(pk=pk).values_list(
+            'updated_at', flat=True,
+        ).order_by().first()
+    except (TypeError, ValueError):
+        last_modified = None
+    if last_modified is None:
+        return None, None
+    return _etag(media_type, pk, last_modified.isoformat()), last_modified
+
+
+def conditional_response(request, validators, view_func):
+    """Answer with 304 Not Modified when the client copy is current,
+    otherwise call view_func and add the validators to its response.
+
+    Validators depend on the negotiated renderer, so responses vary on
+    Accept.
+    """
+    etag, last_modified = validators
+    if etag is None:
+        return view_func()
+
+    timestamp = last_modified and int(last_modified.timestamp())
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=timestamp,
+    )
+    response = not_modified or view_func()
+    patch_vary_headers(response, ['Accept'])
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+
+    return response
@@ -0,0 +1,89 @@
+"""
+Streaming export of recipes.
+"""
+import csv
+import io
+import json
+
+from django.core.files.storage import default_storage
+
+from recipe.renditions import rendition_urls
+from recipe.serializers import RECIPE_ATTR_FIELDS, attrs_by_recipe
+
+EXPORT_FIELDS = [
+    'id', 'title', 'desc', 'time_minutes', 'price', 'link', 'image',
+]
+CHUNK_SIZE = 1000
+
+
+def iter_recipes(queryset, request=None, chunk_size=CHUNK_SIZE):
+    """Yield recipes of queryset as plain dicts, newest first.
+
+    Rows are read in keyset-paginated chunks of `chunk_size`, so memory
+    use does not depend on the number of recipes and no database cursor
+    stays open while the client consumes the stream.
+    """
+    queryset = queryset.prefetch_related(None).order_by('-id')
+    last_id = None
+    while True:
+        chunk = queryset
+        if last_id is not None:
+            chunk = chunk.filter(id__lt=last_id)
+        recipes = list(
+            chunk.values(*EXPORT_FIELDS, 'image_renditions')[:chunk_size]
+        )
+        if not recipes:
+            return
+
+        recipe_ids = [recipe['id'] for recipe in recipes]
+        attrs = {
+            field_name: attrs_by_recipe(field_name, recipe_ids)
+            for field_name in RECIPE_ATTR_FIELDS
+        }
+        for recipe in recipes:
+            recipe['price'] = str(recipe['price'])
+            if recipe['image']:
+                url = default_storage.url(recipe['image'])
+                recipe['image'] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+                recipe['image_renditions'] = rendition_urls(
+                    recipe['image_renditions'], request,
+                )
+            else:
+                recipe['image'] = recipe['image_renditions'] = None
+            for field_name in RECIPE_ATTR_FIELDS:
+                recipe[field_name] = attrs[field_name][recipe['id']]
+            yield recipe
+
+        last_id = recipe_ids[-1]
+
+
+def ndjson_lines(recipes):
+    """Encode recipes as newline delimited JSON."""
+    for recipe in recipes:
+        yield json.dumps(recipe) + '\n'
+
+
+def csv_lines(recipes, separator='|'):
+    """Encode recipes as CSV, joining tag/ingredient names by separator."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(EXPORT_FIELDS + RECIPE_ATTR_FIELDS)
+    yield flush()
+    for recipe in recipes:
+        writer.writerow(
+            [recipe[field] for field in EXPORT_FIELDS]
+            + [
+                separator.join(attr['name'] for attr in recipe[field])
+                for field in RECIPE_ATTR_FIELDS
+            ]
+        )
+        yield flush()
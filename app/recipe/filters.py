@@ -0,0 +1,124 @@
+"""
+Filters for Recipe API
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramSimilarity,
+)
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+
+from core.models import Ingredient, Tag
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+
+# Upper bound on ids accepted by a single filter parameter.
+MAX_FILTER_IDS = 100
+
+# Text search configuration used by the recipe search vector trigger.
+SEARCH_CONFIG = 'english'
+MAX_SEARCH_LENGTH = 200
+
+# Maximum number of tags/ingredients returned for an autocomplete term.
+AUTOCOMPLETE_LIMIT = 20
+MAX_AUTOCOMPLETE_LENGTH = 100
+
+# A positive id that fits in a bigint column.
+ID_RE = re.compile(r'[0-9]{1,18}')
+
+
+def filter_by_related_ids(queryset, field_name, ids, mode=MATCH_ANY):
+    """Filter recipes linked to `ids` through the `field_name` M2M.
+
+    Matching is done with a correlated subquery against the through
+    table, so the outer query is never joined to the link rows and
+    needs no DISTINCT pass.
+    """
+    field = queryset.model._meta.get_field(field_name)
+    through = field.remote_field.through
+    owner_col = f'{field.m2m_field_name()}_id'
+    target_col = f'{field.m2m_reverse_field_name()}_id'
+
+    links = through.objects.filter(
+        **{owner_col: OuterRef('pk'), f'{target_col}__in': ids}
+    )
+
+    if mode == MATCH_ALL:
+        matched = links.order_by().values(owner_col).annotate(
+            matched=Count(target_col)
+        ).values('matched')
+        alias = f'_{field_name}_matched'
+        return queryset.alias(**{alias: Subquery(matched)}).filter(
+            **{alias: len(set(ids))}
+        )
+
+    return queryset.filter(Exists(links))
+
+
+def assigned_to_recipes(queryset):
+    """Filter tags/ingredients linked to at least one recipe."""
+    rel = queryset.model._meta.get_field('recipe')
+    target_col = f'{rel.field.m2m_reverse_field_name()}_id'
+    return queryset.filter(Exists(
+        rel.through.objects.filter(**{target_col: OuterRef('pk')})
+    ))
+
+
+def search_recipes(queryset, terms):
+    """Filter recipes by full-text search over title and description,
+    best matches first."""
+    query = SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query),
+    ).order_by('-search_rank', '-id')
+
+
+def autocomplete(queryset, term, limit=AUTOCOMPLETE_LIMIT):
+    """Return at most `limit` items whose name starts with or resembles
+    term, prefix matches first.
+
+    Both conditions are served by the pg_trgm GIN index on `name`.
+    """
+    prefix = Q(name__iregex=f'^{re.escape(term)}')
+    return queryset.filter(
+        prefix | Q(name__trigram_similar=term)
+    ).annotate(
+        prefix_match=ExpressionWrapper(prefix, output_field=BooleanField()),
+        similarity=TrigramSimilarity('name', term),
+    ).order_by('-prefix_match', '-similarity', 'name')[:limit]
+
+
+def facet_counts(user, recipes=None):
+    """Return the user's tags and ingredients with the number of recipes
+    using each, in one query.
+
+    When `recipes` is given, only links to those recipes are counted.
+    """
+    facets = []
+    for kind, model in [('tags', Tag), ('ingredients', Ingredient)]:
+        count_filter = Q(recipe__in=recipes) if recipes is not None else None
+        facets.append(model.objects.filter(user=user).annotate(
+            kind=Value(kind),
+            count=Count('recipe', filter=count_filter),
+        ).values('kind', 'id', 'name', 'count'))
+
+    result = {kind: [] for kind in ('tags', 'ingredients')}
+    for row in facets[0].union(facets[1], all=True).order_by(
+            '-count', 'name', 'id'):
+        result[row.pop('kind')].append(row)
+
+    return result
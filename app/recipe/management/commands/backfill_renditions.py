@@ -0,0 +1,88 @@
+"""
+Django command to render missing recipe image renditions.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe import renditions
+
+
+def _render(image_name):
+    """Render image_name in a worker process, return (renditions, error)."""
+    try:
+        return renditions.render(image_name), None
+    except Exception as exc:
+        return None, str(exc)
+
+
+class Command(BaseCommand):
+    """Render recipe image renditions across processes."""
+    help = (
+        'Render JPEG/WebP renditions of recipe images that have none yet, '
+        'spreading the encoding over worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Number of worker processes, defaults to the CPU count.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Number of recipes loaded and recorded at a time.',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Render images that already have renditions again.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be positive.')
+
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['force']:
+            recipes = recipes.filter(image_renditions__isnull=True)
+
+        rendered = failed = 0
+        started = time.monotonic()
+        # Spawned workers never inherit the database connection.
+        pool = ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+        with pool:
+            last_id = 0
+            while True:
+                batch = list(
+                    recipes.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', 'image')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                results = pool.map(_render, [name for _, name in batch])
+                for (recipe_id, name), (result, error) in zip(batch, results):
+                    if error is not None:
+                        failed += 1
+                        self.stderr.write(
+                            f'Recipe {recipe_id} ({name}) failed: {error}'
+                        )
+                    elif renditions.save_renditions(recipe_id, name, result):
+                        rendered += 1
+                last_id = batch[-1][0]
+                self.stdout.write(f'{rendered} images rendered')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} images in {elapsed:.1f}s '
+            f'({rendered / max(elapsed, 1e-6):.1f} images/s), '
+            f'{failed} failed.'
+        ))
@@ -0,0 +1,124 @@
+"""
+Django command to benchmark serializing recipe lists.
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import serializers
+
+TAGS_PER_RECIPE = 3
+INGREDIENTS_PER_RECIPE = 8
+
+
+class Command(BaseCommand):
+    """Compare `RecipeSerializer` with `recipe_list_data` on the queries
+    the list view runs, from the database to plain data.
+
+    All data is created inside a transaction which is rolled back at
+    the end.
+    """
+    help = 'Benchmark recipe list serialization, reported in rows/s.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+            help='Numbers of recipes per list.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=10,
+            help='Lists serialized per size and serializer.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        self.stdout.write(
+            f'{"recipes":>10} {"serializer rows/s":>18} '
+            f'{"rows rows/s":>12} {"speedup":>8}'
+        )
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email='benchmark-list@example.com',
+            )
+            tags = Tag.objects.bulk_create(
+                Tag(user=user, name=f'tag {i}') for i in range(50)
+            )
+            ingredients = Ingredient.objects.bulk_create(
+                Ingredient(user=user, name=f'ingredient {i}')
+                for i in range(200)
+            )
+            recipes = Recipe.objects.filter(user=user).order_by('-id')
+            created = 0
+            for size in sorted(options['sizes']):
+                self._seed(user, size - created, tags, ingredients)
+                created = size
+
+                before = self._time(options['repeat'], lambda: (
+                    serializers.RecipeSerializer(
+                        recipes.prefetch_related(
+                            Prefetch('tags', queryset=Tag.objects.only(
+                                'id', 'name',
+                            ).order_by('id')),
+                            Prefetch('ingredients', queryset=(
+                                Ingredient.objects.only('id', 'name')
+                                .order_by('id')
+                            )),
+                        ),
+                        many=True,
+                    ).data
+                ))
+                after = self._time(options['repeat'], lambda: (
+                    serializers.recipe_list_data(
+                        recipes.values(*serializers.RECIPE_LIST_FIELDS)
+                    )
+                ))
+                self.stdout.write(
+                    f'{size:>10} {size / before:>18.0f} '
+                    f'{size / after:>12.0f} {before / after:>7.1f}x'
+                )
+            transaction.set_rollback(True)
+
+    def _seed(self, user, count, tags, ingredients):
+        """Bulk create count recipes for user with tags and ingredients."""
+        rng = random.Random(count)
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'recipe {i}',
+                desc='benchmark recipe',
+                time_minutes=rng.randint(5, 120),
+                price=Decimal(rng.randint(100, 9999)) / 100,
+                link=f'https://example.com/recipes/{i}',
+            )
+            for i in range(count)
+        )
+        links = [
+            ('tags', tags, TAGS_PER_RECIPE),
+            ('ingredients', ingredients, INGREDIENTS_PER_RECIPE),
+        ]
+        for field_name, objs, per_recipe in links:
+            through = getattr(Recipe, field_name).through
+            target = Recipe._meta.get_field(
+                field_name,
+            ).m2m_reverse_field_name()
+            through.objects.bulk_create(
+                through(recipe_id=recipe.id, **{f'{target}_id': obj.id})
+                for recipe in recipes
+                for obj in rng.sample(objs, per_recipe)
+            )
+
+    def _time(self, repeat, serialize):
+        """Return the median duration in seconds of serialize()."""
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serialize()
+            durations.append(time.perf_counter() - started)
+        return statistics.median(durations)
@@ -0,0 +1,85 @@
+"""
+Django command to benchmark rendering recipe lists to JSON.
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import ORJSONRenderer
+
+WORDS = [
+    'chicken', 'beef', 'tofu', 'rice', 'noodle', 'soup', 'curry', 'spicy',
+    'sweet', 'grilled', 'fried', 'coconut', 'garlic', 'ginger', 'chili',
+    'basil', 'egg', 'potato', 'carrot', 'mushroom', 'onion', 'tomato',
+]
+
+
+def _recipes(count):
+    """Return count dicts shaped like `RecipeSerializer` output."""
+    rng = random.Random(0)
+    return [
+        {
+            'id': i,
+            'title': ' '.join(rng.choice(WORDS) for _ in range(3)),
+            'time_minutes': rng.randint(5, 120),
+            'price': str(Decimal(rng.randint(100, 9999)) / 100),
+            'link': f'https://example.com/recipes/{i}',
+            'tags': [
+                {'id': rng.randint(1, 500), 'name': rng.choice(WORDS)}
+                for _ in range(3)
+            ],
+            'ingredients': [
+                {'id': rng.randint(1, 5000), 'name': rng.choice(WORDS)}
+                for _ in range(8)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    """Compare JSONRenderer and ORJSONRenderer on recipe list pages."""
+    help = 'Benchmark rendering recipe lists with json and orjson.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+            help='Numbers of recipes per rendered list.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Renders timed per size and renderer.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        renderers = [JSONRenderer(), ORJSONRenderer()]
+        self.stdout.write(
+            f'{"recipes":>10} {"json rows/s":>14} {"orjson rows/s":>14} '
+            f'{"speedup":>8}'
+        )
+        for size in options['sizes']:
+            data = _recipes(size)
+            rates = []
+            for renderer in renderers:
+                median = statistics.median(
+                    self._time(options['repeat'], renderer, data)
+                )
+                rates.append(size / median)
+            self.stdout.write(
+                f'{size:>10} {rates[0]:>14.0f} {rates[1]:>14.0f} '
+                f'{rates[1] / rates[0]:>7.1f}x'
+            )
+
+    def _time(self, repeat, renderer, data):
+        """Return durations in seconds of rendering data repeat times."""
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            renderer.render(data)
+            durations.append(time.perf_counter() - started)
+        return durations
@@ -0,0 +1,130 @@
+"""
+Django command to benchmark recipe full-text search.
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import Recipe
+from recipe import filters
+
+WORDS = [
+    'chicken', 'beef', 'tofu', 'tempeh', 'rice', 'noodle', 'soup', 'curry',
+    'spicy', 'sweet', 'sour', 'grilled', 'fried', 'steamed', 'coconut',
+    'garlic', 'ginger', 'chili', 'peanut', 'lime', 'basil', 'shrimp',
+    'egg', 'potato', 'cabbage', 'carrot', 'mushroom', 'pepper', 'onion',
+    'tomato', 'cucumber', 'mango', 'banana', 'honey', 'soy', 'sesame',
+]
+
+
+NEEDLES_PER_SIZE = 20
+RECIPES_PER_NEEDLE = 50
+
+
+def _text(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def _needle(number):
+    """Return a made-up word, unique for number, that no recipe contains."""
+    letters = ''
+    while True:
+        number, rest = divmod(number, 26)
+        letters += chr(ord('a') + rest)
+        if not number:
+            return f'zq{letters}'
+
+
+class Command(BaseCommand):
+    """Measure search latency for growing numbers of recipes.
+
+    The searched words match a fixed number of recipes at every size, so
+    the timings show the cost of finding matches rather than of ranking
+    more of them. All data is created inside a transaction which is
+    rolled back at the end.
+    """
+    help = 'Benchmark recipe full-text search against table size.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+',
+            default=[1000, 10000, 100000],
+            help='Numbers of recipes to measure at.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Queries timed per size.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        rng = random.Random(0)
+        self.stdout.write(
+            f'{"recipes":>10} {"search p50 ms":>14} {"search p95 ms":>14} '
+            f'{"icontains p50 ms":>17}'
+        )
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email='benchmark-search@example.com',
+            )
+            created = 0
+            for size in sorted(options['sizes']):
+                needles = [
+                    _needle(size * NEEDLES_PER_SIZE + i)
+                    for i in range(NEEDLES_PER_SIZE)
+                ]
+                self._seed(rng, user, size - created, needles)
+                created = size
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE core_recipe')
+
+                recipes = Recipe.objects.filter(user=user)
+                search = self._time(options['repeat'], lambda: list(
+                    filters.search_recipes(recipes, rng.choice(needles))[:50]
+                ))
+                scan = self._time(options['repeat'], lambda: list(
+                    recipes.filter(
+                        title__icontains=rng.choice(needles)
+                    ).order_by('-id')[:50]
+                ))
+                self.stdout.write(
+                    f'{size:>10} {statistics.median(search):>14.2f} '
+                    f'{search[int(len(search) * 0.95) - 1]:>14.2f} '
+                    f'{statistics.median(scan):>17.2f}'
+                )
+            transaction.set_rollback(True)
+
+    def _seed(self, rng, user, count, needles, batch_size=5000):
+        """Bulk create count recipes for user, a few of them mentioning
+        each of the needle words in their title."""
+        titles = [
+            f'{_text(rng, 2)} {needle}'
+            for needle in needles for _ in range(RECIPES_PER_NEEDLE)
+        ]
+        titles += [_text(rng, 3) for _ in range(count - len(titles))]
+        rng.shuffle(titles)
+        for start in range(0, len(titles), batch_size):
+            Recipe.objects.bulk_create([
+                Recipe(
+                    user=user,
+                    title=title,
+                    desc=_text(rng, 30),
+                    time_minutes=rng.randint(5, 120),
+                    price=Decimal('1.00'),
+                )
+                for title in titles[start:start + batch_size]
+            ])
+
+    def _time(self, repeat, query):
+        """Return sorted durations in ms of running query repeat times."""
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            durations.append((time.perf_counter() - started) * 1000)
+        return sorted(durations)
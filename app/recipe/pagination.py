@@ -0,0 +1,31 @@
+"""
+Pagination for Recipe API
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over recipes ordered by newest first.
+
+    Pagination is opt-in: it is only applied when the client sends
+    a cursor or a page size, so existing clients keep receiving the
+    full unpaginated list.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def is_requested(self, request):
+        """Return True if the client asked for a paginated response."""
+        params = request.query_params
+        return (
+            self.cursor_query_param in params
+            or self.page_size_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        return super().paginate_queryset(queryset, request, view=view)
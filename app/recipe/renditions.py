@@ -0,0 +1,209 @@
+"""
+Resized JPEG/WebP renditions of recipe images.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models.functions import Now
+from PIL import Image, ImageOps
+
+from core.models import Recipe
+from core.storage import image_references, link_file, lock_images
+from recipe.cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+# name: (max width, max height)
+SIZES = {
+    'thumbnail': (320, 320),
+    'medium': (960, 960),
+}
+# format: (extension, save options)
+FORMATS = {
+    'jpeg': ('jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+}
+ROOT = 'renditions'
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def rendition_name(image_name, size, fmt):
+    """Return the storage name of a rendition of image_name."""
+    stem = os.path.splitext(image_name)[0]
+    return os.path.join(ROOT, f'{stem}_{size}.{FORMATS[fmt][0]}')
+
+
+def parse_rendition_name(name):
+    """Return the (size, fmt) of a rendition storage name, or None."""
+    if not name.startswith(f'{ROOT}/'):
+        return None
+    stem, ext = os.path.splitext(name)
+    size = stem.rpartition('_')[2]
+    for fmt, (extension, _) in FORMATS.items():
+        if ext == f'.{extension}' and size in SIZES:
+            return size, fmt
+    return None
+
+
+def rendition_urls(renditions, request=None):
+    """Return {size: {fmt: URL}} for the recorded renditions, or None."""
+    if not renditions:
+        return None
+    urls = {}
+    for size, names in renditions.items():
+        urls[size] = {}
+        for fmt, name in names.items():
+            url = default_storage.url(name)
+            urls[size][fmt] = (
+                request.build_absolute_uri(url) if request else url
+            )
+    return urls
+
+
+def render(image_name):
+    """Write every rendition of image_name, return {size: {fmt: name}}."""
+    with default_storage.open(image_name) as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+    renditions = {}
+    for size, box in SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(box, Image.LANCZOS)
+        renditions[size] = {}
+        for fmt, (_, options) in FORMATS.items():
+            name = rendition_name(image_name, size, fmt)
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), **options)
+            # Storages pick a new name for existing files.
+            default_storage.delete(name)
+            renditions[size][fmt] = default_storage.save(
+                name, ContentFile(buffer.getvalue()),
+            )
+    return renditions
+
+
+def save_renditions(recipe_id, image_name, renditions):
+    """Record renditions unless the recipe image changed meanwhile."""
+    updated = Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        image_renditions=renditions, updated_at=Now(),
+    )
+    if updated:
+        user_id = Recipe.objects.values_list(
+            'user_id', flat=True,
+        ).get(id=recipe_id)
+        bump_generation(user_id)
+    return bool(updated)
+
+
+def image_files(image_name):
+    """Return the storage names of an image and all its renditions."""
+    return [image_name] + [
+        rendition_name(image_name, size, fmt)
+        for size in SIZES for fmt in FORMATS
+    ]
+
+
+def link_renditions(renditions, image_name):
+    """Link recorded renditions to the rendition names of image_name.
+
+    Used when an image is renamed; returns the renditions to record for
+    image_name, or None when a file is missing and they must be rendered
+    again. The old files are left for the caller to delete.
+    """
+    if not renditions:
+        return None
+    linked = {}
+    for size, names in renditions.items():
+        linked[size] = {}
+        for fmt, name in names.items():
+            new_name = rendition_name(image_name, size, fmt)
+            if not default_storage.exists(new_name):
+                path = default_storage.path(name)
+                if not os.path.exists(path):
+                    return None
+                link_file(path, default_storage.path(new_name))
+            linked[size][fmt] = new_name
+    return linked
+
+
+def delete_unused_image(image_name):
+    """Delete an image and its renditions unless a recipe still uses it.
+
+    Images are shared by content, see `core.storage`.
+    """
+    if not image_name:
+        return False
+    with transaction.atomic():
+        lock_images([image_name])
+        if image_references(image_name):
+            return False
+        for name in image_files(image_name):
+            default_storage.delete(name)
+    return True
+
+
+def render_recipe(recipe_id, image_name):
+    """Render and record the renditions of a recipe image."""
+    try:
+        # Identical uploads share one file, and so its renditions.
+        existing = Recipe.objects.filter(
+            image=image_name, image_renditions__isnull=False,
+        ).values_list('image_renditions', flat=True).first()
+        save_renditions(recipe_id, image_name, existing or render(image_name))
+    except Exception:
+        logger.exception('Rendering %s of recipe %s failed.',
+                         image_name, recipe_id)
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = settings.RECIPE_RENDITION_WORKERS
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='renditions',
+            )
+            _slots = threading.BoundedSemaphore(
+                workers + settings.RECIPE_RENDITION_QUEUE_SIZE,
+            )
+    return _executor, _slots
+
+
+def schedule(recipe_id, image_name):
+    """Render the renditions of a recipe image in the background.
+
+    The pool is bounded; when it is saturated the job is dropped and left
+    to the `backfill_renditions` command. Returns whether it was queued.
+    """
+    if not settings.RECIPE_RENDITION_WORKERS:
+        render_recipe(recipe_id, image_name)
+        return True
+
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        logger.warning('Rendition queue full, skipped recipe %s.', recipe_id)
+        return False
+
+    def run():
+        try:
+            render_recipe(recipe_id, image_name)
+        finally:
+            # Pool threads outlive requests, do not keep connections open.
+            connection.close()
+            slots.release()
+
+    executor.submit(run)
+    return True
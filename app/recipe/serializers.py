@@ -1,9 +1,14 @@
 """
 Serializers of Recipe API
 """
+from django.db import transaction
+from django.db.models.functions import Lower
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 from core.models import Recipe, Tag, Ingredient
+from recipe.renditions import rendition_urls
+from recipe.uploads import ImageHeaderField
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -22,7 +27,53 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_field = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    """Create many recipes with a fixed number of queries."""
+
+    def create(self, validated_data):
+        """Bulk insert recipes and link their tags and ingredients."""
+        nested = [
+            {
+                'tags': item.pop('tags', []),
+                'ingredients': item.pop('ingredients', []),
+            }
+            for item in validated_data
+        ]
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                [Recipe(**item) for item in validated_data]
+            )
+            attr_models = [('tags', Tag), ('ingredients', Ingredient)]
+            for field_name, model in attr_models:
+                objs = self.child._bulk_get_or_create(model, [
+                    item for attrs in nested for item in attrs[field_name]
+                ])
+                ids_by_name = {obj.name.lower(): obj.id for obj in objs}
+                self.child._add_links(field_name, {
+                    (recipe.id, ids_by_name[item['name'].lower()])
+                    for recipe, attrs in zip(recipes, nested)
+                    for item in attrs[field_name]
+                })
+
+        return recipes
+
+
+class SparseFieldsMixin:
+    """ModelSerializer building only the fields named in a `fields`
+    argument, in their declared order."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        self.sparse_fields = fields
+        super().__init__(*args, **kwargs)
+
+    def get_field_names(self, declared_fields, info):
+        names = super().get_field_names(declared_fields, info)
+        if self.sparse_fields is None:
+            return names
+        return [name for name in names if name in self.sparse_fields]
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for Recipe models."""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -34,36 +85,86 @@ class RecipeSerializer(serializers.ModelSerializer):
             'tags', 'ingredients',
             ]
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
 
-    def _get_or_create_tags(self, tags, recipe):
-        """Handles getting or creating tags as needed."""
+    def _bulk_get_or_create(self, model, items):
+        """Return the user's `model` rows named in items, creating any
+        missing ones in a single insert."""
         auth_user = self.context['request'].user
+        names = {}
+        for item in items:
+            names.setdefault(item['name'].lower(), item['name'])
+        if not names:
+            return []
 
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
+        queryset = model.objects.alias(lower_name=Lower('name')).filter(
+            user=auth_user,
+        )
+        found = list(queryset.filter(lower_name__in=names))
+        found_names = {obj.name.lower() for obj in found}
+        missing = [
+            model(user=auth_user, name=name)
+            for key, name in names.items() if key not in found_names
+        ]
+        if missing:
+            # Conflicts are rows created concurrently, picked up below.
+            model.objects.bulk_create(missing, ignore_conflicts=True)
+            found += queryset.filter(
+                lower_name__in=[obj.name.lower() for obj in missing],
             )
-            recipe.tags.add(tag_obj)
+
+        return found
+
+    def _add_links(self, field_name, pairs):
+        """Insert (recipe id, object id) pairs into the `field_name`
+        through table with a single query."""
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        target_col = f'{field.m2m_reverse_field_name()}_id'
+        through.objects.bulk_create(
+            [through(recipe_id=recipe_id, **{target_col: obj_id})
+             for recipe_id, obj_id in pairs],
+            ignore_conflicts=True,
+        )
+
+    def _set_links(self, recipe, field_name, objs):
+        """Make objs the links of recipe, touching only changed rows."""
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        target_col = f'{field.m2m_reverse_field_name()}_id'
+        links = through.objects.filter(recipe_id=recipe.id)
+        current_ids = set(links.values_list(target_col, flat=True))
+        wanted_ids = {obj.id for obj in objs}
+
+        removed_ids = current_ids - wanted_ids
+        if removed_ids:
+            links.filter(**{f'{target_col}__in': removed_ids}).delete()
+        self._add_links(
+            field_name,
+            [(recipe.id, obj_id) for obj_id in wanted_ids - current_ids],
+        )
+
+    def _get_or_create_tags(self, tags, recipe):
+        """Handles getting or creating tags as needed."""
+        tag_objs = self._bulk_get_or_create(Tag, tags)
+        self._add_links('tags', [(recipe.id, obj.id) for obj in tag_objs])
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handles getting or creating ingredients as needed."""
-        auth_user = self.context['request'].user
-
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
-            )
-            recipe.ingredients.add(ingredient_obj)
+        ingredient_objs = self._bulk_get_or_create(Ingredient, ingredients)
+        self._add_links(
+            'ingredients',
+            [(recipe.id, obj.id) for obj in ingredient_objs],
+        )
 
     def create(self, validated_data):
         """Create a recipe"""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            self._get_or_create_tags(tags, recipe)
+            self._get_or_create_ingredients(ingredients, recipe)
 
         return recipe
 
@@ -71,32 +172,139 @@ class RecipeSerializer(serializers.ModelSerializer):
         """Update a recipe."""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+        with transaction.atomic():
+            if tags is not None:
+                self._set_links(
+                    instance, 'tags',
+                    self._bulk_get_or_create(Tag, tags),
+                )
 
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            if ingredients is not None:
+                self._set_links(
+                    instance, 'ingredients',
+                    self._bulk_get_or_create(Ingredient, ingredients),
+                )
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
 
-        instance.save()
+            instance.save()
         return instance
 
 
+RECIPE_LIST_FIELDS = ['id', 'title', 'time_minutes', 'price', 'link']
+RECIPE_ATTR_FIELDS = ['tags', 'ingredients']
+
+
+def attrs_by_recipe(field_name, recipe_ids):
+    """Return {recipe id: [{'id', 'name'}]} for the `field_name` M2M,
+    ordered by id, in one query."""
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    target = field.m2m_reverse_field_name()
+    attrs = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = through.objects.filter(recipe_id__in=recipe_ids).values_list(
+        'recipe_id', f'{target}_id', f'{target}__name',
+    ).order_by(f'{target}_id')
+    for recipe_id, attr_id, name in rows:
+        attrs[recipe_id].append({'id': attr_id, 'name': name})
+
+    return attrs
+
+
+def recipe_list_values(fields=None):
+    """Return the `values()` names to read for `recipe_list_data`."""
+    return [
+        name for name in RECIPE_LIST_FIELDS
+        if fields is None or name in fields or name == 'id'
+    ]
+
+
+def recipe_list_data(rows, fields=None):
+    """Return the `RecipeSerializer` representation of recipe rows.
+
+    rows are `Recipe` `values()` dicts of `recipe_list_values(fields)`.
+    They are completed in place with plain dicts of tags and
+    ingredients, so no serializer field runs per row; the rendered
+    output is the same. Only the `fields` given are returned, if any.
+    """
+    rows = list(rows)
+    if not rows:
+        return rows
+
+    recipe_ids = [row['id'] for row in rows]
+    attrs = [
+        (field_name, attrs_by_recipe(field_name, recipe_ids))
+        for field_name in RECIPE_ATTR_FIELDS
+        if fields is None or field_name in fields
+    ]
+    price = None
+    if 'price' in rows[0]:
+        price = RecipeSerializer().fields['price'].to_representation
+    for row in rows:
+        if price:
+            row['price'] = price(row['price'])
+        for field_name, by_recipe in attrs:
+            row[field_name] = by_recipe[row['id']]
+
+    if fields is not None and 'id' not in fields:
+        # Copies, pagination still reads the ids of rows.
+        return [
+            {name: value for name, value in row.items() if name != 'id'}
+            for row in rows
+        ]
+    return rows
+
+
+class RenditionSerializer(serializers.Serializer):
+    """Serializer for the URLs of one rendition size."""
+    jpeg = serializers.URLField(read_only=True)
+    webp = serializers.URLField(read_only=True)
+
+
+class RecipeRenditionsSerializer(serializers.Serializer):
+    """Serializer for the resized renditions of a recipe image."""
+    thumbnail = RenditionSerializer(read_only=True)
+    medium = RenditionSerializer(read_only=True)
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe details"""
+    image_renditions = serializers.SerializerMethodField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['desc', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'desc', 'image', 'image_renditions',
+        ]
+
+    @extend_schema_field(RecipeRenditionsSerializer(allow_null=True))
+    def get_image_renditions(self, recipe):
+        """Return rendition URLs, null until they are rendered."""
+        if not recipe.image:
+            return None
+        return rendition_urls(
+            recipe.image_renditions, self.context.get('request'),
+        )
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for Recipe Image API."""
+    image = ImageHeaderField()
+
     class Meta:
         model = Recipe
         fields = ['id', 'image']
         read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
+
+
+class FacetSerializer(serializers.Serializer):
+    """Serializer for a tag or ingredient with its recipe count."""
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+
+
+class RecipeFacetsSerializer(serializers.Serializer):
+    """Serializer for tag and ingredient facet counts."""
+    tags = FacetSerializer(many=True, read_only=True)
+    ingredients = FacetSerializer(many=True, read_only=True)
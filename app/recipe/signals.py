@@ -0,0 +1,40 @@
+"""
+Signal handlers for Recipe API.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import bump_generation
+from recipe.renditions import delete_unused_image
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Invalidate cached responses of the owner of a changed object."""
+    bump_generation(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_user_cache_on_links(sender, instance, action, **kwargs):
+    """Invalidate cached responses when recipe links change."""
+    if action.startswith('post_'):
+        bump_generation(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image(sender, instance, **kwargs):
+    """Remove the image of a deleted recipe once the deletion commits."""
+    if instance.image:
+        transaction.on_commit(
+            partial(delete_unused_image, instance.image.name)
+        )
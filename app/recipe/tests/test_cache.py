@@ -0,0 +1,175 @@
+"""
+Test for the Recipe API response cache.
+"""
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag
+from recipe.cache import cache_stats
+
+RECIPE_URL = reverse('recipe:recipe-list')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+TAGS_URL = reverse('recipe:tag-list')
+
+# Files are shared between processes, unlike the local memory default.
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'recipe-api-cache'),
+    }
+}
+
+
+def detail_url(recipe_id):
+    """return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 11,
+        'price': Decimal('5.11'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class ResponseCacheTests(TestCase):
+    """Test caching of read responses."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testing1q2w3e',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request is answered without queries."""
+        create_recipe(user=self.user)
+        res1 = self.client.get(RECIPE_URL)
+
+        # only the ETag aggregate
+        with self.assertNumQueries(1):
+            res2 = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res1['X-Cache'], 'MISS')
+        self.assertEqual(res2['X-Cache'], 'HIT')
+        self.assertEqual(res1.data, res2.data)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_query_params_are_part_of_key(self):
+        """Test different query params are cached separately."""
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        create_recipe(user=self.user).tags.add(tag)
+        create_recipe(user=self.user)
+
+        self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL, {'tags': tag.id})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data), 1)
+
+    def test_api_writes_invalidate(self):
+        """Test creating, updating and deleting through the API."""
+        self.client.get(RECIPE_URL)
+        res = self.client.post(
+            RECIPE_URL,
+            {'title': 'Soup', 'time_minutes': 5, 'price': '1.00'},
+        )
+        recipe_id = res.data['id']
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data), 1)
+
+        self.client.get(detail_url(recipe_id))
+        self.client.patch(detail_url(recipe_id), {'title': 'Stew'})
+        res = self.client.get(detail_url(recipe_id))
+        self.assertEqual(res.data['title'], 'Stew')
+
+        self.client.delete(detail_url(recipe_id))
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data, [])
+
+    def test_bulk_create_invalidates(self):
+        """Test the bulk endpoint invalidates the list."""
+        self.client.get(RECIPE_URL)
+        payload = [{'title': 'Soup', 'time_minutes': 5, 'price': '1.00'}]
+        self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_model_changes_invalidate(self):
+        """Test changes outside the API, e.g. from the admin."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        self.client.get(TAGS_URL)
+        self.client.get(detail_url(recipe.id))
+
+        tag.name = 'Dinner'
+        tag.save()
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res.data[0]['name'], 'Dinner')
+        res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['tags'][0]['name'], 'Dinner')
+
+    def test_other_users_cache_kept(self):
+        """Test writes only invalidate the owner's cache."""
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testing1q2w3e',
+        )
+        other_client = APIClient()
+        other_client.force_authenticate(other_user)
+        other_client.get(RECIPE_URL)
+
+        create_recipe(user=self.user)
+        res = other_client.get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    @override_settings(RECIPE_RESPONSE_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        """Test responses are not cached when disabled."""
+        self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Cache', res)
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    })
+    def test_cache_disabled_with_local_memory_cache(self):
+        """Test responses are not cached in a cache of one worker."""
+        create_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+
+        # ETag aggregate + recipes + tags + ingredients
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Cache', res)
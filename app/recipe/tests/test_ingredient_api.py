@@ -159,3 +159,28 @@ class PrivateIngredientsApiTest(TestCase):
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_autocomplete_ingredients(self):
+        """Test autocomplete returns prefix matches before fuzzy ones."""
+        tomato = create_ingredient(user=self.user, name='Tomato')
+        paste = create_ingredient(user=self.user, name='Tomato paste')
+        create_ingredient(user=self.user, name='Potato')
+        create_ingredient(user=self.user, name='Salt')
+        create_ingredient(user=create_user(email='o@example.com'),
+                          name='Tomato sauce')
+
+        res = self.client.get(INGREDIENT_URL, {'q': 'tomat'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        names = [item['name'] for item in res.data]
+        self.assertEqual(names[:2], [tomato.name, paste.name])
+        self.assertNotIn('Salt', names)
+        self.assertNotIn('Tomato sauce', names)
+
+    def test_autocomplete_ingredients_fuzzy(self):
+        """Test autocomplete matches misspelled terms."""
+        create_ingredient(user=self.user, name='Cinnamon')
+
+        res = self.client.get(INGREDIENT_URL, {'q': 'cinamon'})
+
+        self.assertEqual([item['name'] for item in res.data], ['Cinnamon'])
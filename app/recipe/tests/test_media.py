@@ -0,0 +1,101 @@
+"""
+Test for the protected media view.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe
+
+IMAGE_NAME = 'uploads/recipe/sample.jpg'
+RENDITION_NAME = 'renditions/uploads/recipe/sample_thumbnail.webp'
+
+
+def media_url(name):
+    """Return the media URL of a storage name."""
+    return reverse('recipe:media', args=[name])
+
+
+class RecipeMediaTests(TestCase):
+    """Test serving recipe images."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testing1q2w3e',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample Recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+            image=IMAGE_NAME,
+            image_renditions={'thumbnail': {'webp': RENDITION_NAME}},
+        )
+
+    def test_storage_url_is_protected_view(self):
+        """Test image URLs point at the media view."""
+        self.assertEqual(self.recipe.image.url, media_url(IMAGE_NAME))
+
+    def test_owner_redirected_to_nginx(self):
+        """Test the owner gets an X-Accel-Redirect without a body."""
+        res = self.client.get(media_url(IMAGE_NAME))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Accel-Redirect'], '/protected-media/' + IMAGE_NAME,
+        )
+        self.assertNotIn('Content-Type', res)
+        self.assertEqual(res.content, b'')
+
+    def test_owner_gets_rendition(self):
+        """Test renditions are served to the owner of the recipe."""
+        res = self.client.get(media_url(RENDITION_NAME))
+
+        self.assertEqual(
+            res['X-Accel-Redirect'], '/protected-media/' + RENDITION_NAME,
+        )
+
+    def test_other_user_not_found(self):
+        """Test images of other users are not served."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testing1q2w3e',
+        )
+        self.client.force_authenticate(other)
+
+        for name in [IMAGE_NAME, RENDITION_NAME]:
+            res = self.client.get(media_url(name))
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_file_not_found(self):
+        """Test files not used by a recipe are not served."""
+        res = self.client.get(media_url('uploads/recipe/other.jpg'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_auth_required(self):
+        """Test unauthenticated requests are rejected."""
+        res = APIClient().get(media_url(IMAGE_NAME))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(DEBUG=True)
+    def test_debug_serves_file(self):
+        """Test files are served directly without nginx in DEBUG."""
+        name = default_storage.save(IMAGE_NAME, ContentFile(b'image'))
+        self.addCleanup(default_storage.delete, name)
+        Recipe.objects.filter(id=self.recipe.id).update(image=name)
+
+        res = self.client.get(media_url(name))
+
+        self.assertEqual(b''.join(res.streaming_content), b'image')
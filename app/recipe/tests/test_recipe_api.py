@@ -1,15 +1,24 @@
 """
 Test recipe API
 """
+import csv
+import hashlib
+import io
+import json
 import tempfile
+import time
 import os
+from unittest.mock import patch
 
 from PIL import Image  # PIL = Pillow Image Library
 
 from decimal import Decimal
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -19,6 +28,9 @@ from core.models import (
     Tag,
     Ingredient,
 )
+from core.renderers import ORJSONRenderer
+from core.storage import image_references
+from recipe import export
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
@@ -26,6 +38,9 @@ from recipe.serializers import (
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+RECIPE_EXPORT_URL = reverse('recipe:recipe-export')
+RECIPE_FACETS_URL = reverse('recipe:recipe-facets')
 
 
 def detail_url(recipe_id):
@@ -266,6 +281,69 @@ class PrivateRecipeApiTests(TestCase):
             ).exists()
             self.assertTrue(exists)
 
+    def test_create_recipe_with_existing_tags_other_case(self):
+        """Test tags are matched case-insensitively when creating."""
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        payload = {
+            'title': 'Nasi Goreng',
+            'time_minutes': 30,
+            'price': Decimal('1.99'),
+            'tags': [{'name': 'lunch'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(list(recipe.tags.all()), [tag])
+
+    def test_create_recipe_queries_independent_of_nested_count(self):
+        """Test create query count does not grow with tags/ingredients."""
+        Tag.objects.create(user=self.user, name='Existing')
+
+        def payload(count):
+            return {
+                'title': 'Nasi Goreng',
+                'time_minutes': 30,
+                'price': Decimal('1.99'),
+                'tags': [{'name': 'Existing'}] + [
+                    {'name': f'Tag {count}-{i}'} for i in range(count)
+                ],
+                'ingredients': [
+                    {'name': f'Ing {count}-{i}'} for i in range(count)
+                ],
+            }
+
+        with CaptureQueriesContext(connection) as small:
+            res = self.client.post(RECIPE_URL, payload(2), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.post(RECIPE_URL, payload(30), format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(small), len(large))
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 31)
+        self.assertEqual(recipe.ingredients.count(), 30)
+        self.assertEqual(
+            Tag.objects.filter(user=self.user, name='Existing').count(), 1
+        )
+
+    def test_create_recipe_with_repeated_tag_names(self):
+        """Test repeated names in the payload create a single tag."""
+        payload = {
+            'title': 'Nasi Goreng',
+            'time_minutes': 30,
+            'price': Decimal('1.99'),
+            'tags': [{'name': 'Lunch'}, {'name': 'lunch'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+
     def test_create_tag_on_update(self):
         """Test creating tag when updating an existing recipe."""
         recipe = create_recipe(user=self.user)
@@ -295,6 +373,56 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(tag_lunch, recipe.tags.all())
         self.assertNotIn(tag_breakfast, recipe.tags.all())
 
+    def test_update_unchanged_tags_keeps_links(self):
+        """Test resending the same tags does not rewrite link rows."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        recipe.tags.add(tag1, tag2)
+        through = Recipe.tags.through
+        link_ids = set(
+            through.objects.filter(recipe=recipe).values_list('id', flat=True)
+        )
+
+        payload = {'tags': [{'name': 'Breakfast'}, {'name': 'Lunch'}]}
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(through.objects.filter(recipe=recipe).values_list(
+                'id', flat=True
+            )),
+            link_ids,
+        )
+        for query in ctx.captured_queries:
+            self.assertFalse(query['sql'].startswith((
+                'INSERT INTO "core_recipe_tags"',
+                'DELETE FROM "core_recipe_tags"',
+            )))
+
+    def test_update_tags_changes_only_diff(self):
+        """Test updating tags keeps links that are still wanted."""
+        recipe = create_recipe(user=self.user)
+        keep = Tag.objects.create(user=self.user, name='Keep')
+        drop = Tag.objects.create(user=self.user, name='Drop')
+        recipe.tags.add(keep, drop)
+        kept_link = Recipe.tags.through.objects.get(recipe=recipe, tag=keep)
+
+        payload = {'tags': [{'name': 'Keep'}, {'name': 'New'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(t['name'] for t in res.data['tags']), ['Keep', 'New']
+        )
+        self.assertTrue(
+            Recipe.tags.through.objects.filter(id=kept_link.id).exists()
+        )
+        self.assertNotIn(drop, recipe.tags.all())
+
     def test_clearing_recipe_tags(self):
         """Test clearing a recipe tags."""
         recipe = create_recipe(user=self.user)
@@ -456,6 +584,599 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def test_filter_by_all_tags(self):
+        """Test filtering recipes matching all of the given tags."""
+        recipe1 = create_recipe(user=self.user, title='Mie Goreng Jawa')
+        recipe2 = create_recipe(user=self.user, title='Cap Cay')
+        tag1 = Tag.objects.create(user=self.user, name='Mie')
+        tag2 = Tag.objects.create(user=self.user, name='Sayuran')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'tags_mode': 'all'}
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['id'], recipe1.id)
+
+    def test_filter_by_all_ingredients_duplicate_ids(self):
+        """Test repeated ids do not break all-of ingredient matching."""
+        recipe = create_recipe(user=self.user)
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe.ingredients.add(ingredient)
+
+        params = {
+            'ingredients': f'{ingredient.id},{ingredient.id}',
+            'ingredients_mode': 'all',
+        }
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_filter_by_tags_no_duplicates(self):
+        """Test a recipe matching several tags is returned once."""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Mie')
+        tag2 = Tag.objects.create(user=self.user, name='Sayuran')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_filter_invalid_params(self):
+        """Test malformed filter params give a bad request."""
+        too_many = ','.join(str(i) for i in range(1, 1000))
+        invalid_params = [
+            {'tags': 'abc'},
+            {'tags': '1,,2'},
+            {'ingredients': '-1'},
+            {'ingredients': '9' * 30},
+            {'tags': too_many},
+            {'tags': '1', 'tags_mode': 'some'},
+        ]
+
+        for params in invalid_params:
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes(self):
+        """Test full-text search over title and description."""
+        recipe1 = create_recipe(
+            user=self.user, title='Chicken soup', desc='Warm and tasty',
+        )
+        recipe2 = create_recipe(
+            user=self.user, title='Fried rice', desc='With fried chicken',
+        )
+        create_recipe(user=self.user, title='Pancakes', desc='Sweet')
+        other_user = create_user(email='other@example.com', password='pw1')
+        create_recipe(user=other_user, title='Chicken curry')
+
+        res = self.client.get(RECIPE_URL, {'search': 'chickens'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # A title match ranks above a description match.
+        self.assertEqual(
+            [r['id'] for r in res.data], [recipe1.id, recipe2.id]
+        )
+
+    def test_search_sees_updated_text(self):
+        """Test the search index follows recipe updates."""
+        recipe = create_recipe(user=self.user, title='Pancakes')
+        self.client.patch(detail_url(recipe.id), {'title': 'Waffles'})
+
+        res = self.client.get(RECIPE_URL, {'search': 'waffle'})
+
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+
+    def test_search_with_tag_filter(self):
+        """Test search combines with the tag filter."""
+        recipe1 = create_recipe(user=self.user, title='Chicken soup')
+        create_recipe(user=self.user, title='Chicken satay')
+        tag = Tag.objects.create(user=self.user, name='Soup')
+        recipe1.tags.add(tag)
+
+        res = self.client.get(
+            RECIPE_URL, {'search': 'chicken', 'tags': tag.id}
+        )
+
+        self.assertEqual([r['id'] for r in res.data], [recipe1.id])
+
+    def test_search_too_long(self):
+        """Test overly long search terms give a bad request."""
+        res = self.client.get(RECIPE_URL, {'search': 'x' * 500})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _create_recipes_with_attrs(self, count):
+        """Create recipes each linked to a tag and an ingredient."""
+        start = Recipe.objects.filter(user=self.user).count()
+        for i in range(start, start + count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Ing {i}')
+            )
+
+    def test_list_recipes_constant_queries(self):
+        """Test listing recipes does not query tags/ingredients per row."""
+        self._create_recipes_with_attrs(5)
+
+        # ETag aggregate + recipes + prefetched tags + prefetched ingredients
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+
+        self._create_recipes_with_attrs(5)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 10)
+
+    def test_list_matches_serializer_output(self):
+        """Test the list is rendered exactly as RecipeSerializer would."""
+        self._create_recipes_with_attrs(3)
+        recipe = create_recipe(
+            user=self.user, price=Decimal('0.50'), link='',
+            title='Café  ',
+        )
+        recipe.tags.add(*Tag.objects.filter(user=self.user))
+        create_recipe(user=self.user, price=Decimal('100'))
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        expected = RecipeSerializer(recipes, many=True).data
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.content, ORJSONRenderer().render(expected))
+
+        res = self.client.get(RECIPE_URL, {'page_size': 3})
+        self.assertEqual(
+            json.dumps(res.data['results']), json.dumps(expected[:3]),
+        )
+
+    def test_retrieve_recipe_constant_queries(self):
+        """Test retrieving a recipe prefetches tags and ingredients."""
+        recipe = create_recipe(user=self.user)
+        for i in range(3):
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Ing {i}')
+            )
+
+        # updated_at + recipe + prefetched tags + prefetched ingredients
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 3)
+        self.assertEqual(len(res.data['ingredients']), 3)
+
+    def test_list_unpaginated_without_page_params(self):
+        """Test list stays a plain array when no page params are sent."""
+        create_recipe(user=self.user)
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.data, list)
+        self.assertEqual(len(res.data), 2)
+
+    def test_list_cursor_pagination(self):
+        """Test paging through recipes with a cursor."""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+        expected_ids = [r.id for r in reversed(recipes)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+        seen_ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(len(seen_ids), 2)
+
+        next_url = res.data['next']
+        while next_url:
+            res = self.client.get(next_url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen_ids += [r['id'] for r in res.data['results']]
+            next_url = res.data['next']
+
+        self.assertEqual(seen_ids, expected_ids)
+
+    def test_list_sparse_fields(self):
+        """Test listing only some fields skips the other columns."""
+        self._create_recipes_with_attrs(2)
+
+        # ETag aggregate + recipes, no tags or ingredients
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, {'fields': 'title,price'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'title': 'Recipe 1', 'price': '5.11'},
+            {'title': 'Recipe 0', 'price': '5.11'},
+        ])
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn('"link"', ctx.captured_queries[1]['sql'])
+
+    def test_list_sparse_fields_paginated(self):
+        """Test paging through a list without ids."""
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        res = self.client.get(RECIPE_URL, {'fields': 'title', 'page_size': 2})
+        titles = [r['title'] for r in res.data['results']]
+        res = self.client.get(res.data['next'])
+        titles += [r['title'] for r in res.data['results']]
+
+        self.assertEqual(titles, ['Recipe 2', 'Recipe 1', 'Recipe 0'])
+        self.assertEqual(res.data['results'], [{'title': 'Recipe 0'}])
+
+    def test_retrieve_sparse_fields(self):
+        """Test retrieving some fields skips desc and other relations."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+
+        # updated_at + recipe + prefetched tags
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                detail_url(recipe.id), {'fields': 'id,title,tags'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data), ['id', 'title', 'tags'])
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertNotIn('"desc"', ctx.captured_queries[1]['sql'])
+
+    def test_retrieve_omit_fields(self):
+        """Test leaving fields out of a recipe."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(
+            detail_url(recipe.id), {'omit': 'desc,tags,ingredients'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data), [
+            'id', 'title', 'time_minutes', 'price', 'link',
+            'image', 'image_renditions',
+        ])
+
+    def test_sparse_fields_unknown(self):
+        """Test unknown field names give a bad request."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, {'fields': 'title,desc'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('desc', res.data['fields'])
+
+        res = self.client.get(detail_url(recipe.id), {'omit': 'user'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_cursor_pagination_no_offset(self):
+        """Test deep pages are fetched by keyset rather than OFFSET."""
+        for i in range(4):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        res = self.client.get(RECIPE_URL, {'page_size': 1})
+        res = self.client.get(res.data['next'])
+        next_url = res.data['next']
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(next_url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in ctx.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def _bulk_payload(self, count, prefix='Recipe'):
+        """Return a list of recipe payloads for bulk create."""
+        return [
+            {
+                'title': f'{prefix} {i}',
+                'time_minutes': 10,
+                'price': '1.50',
+                'tags': [{'name': 'Lunch'}, {'name': f'Tag {prefix} {i}'}],
+                'ingredients': [{'name': f'Salt {prefix}'}],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_recipes(self):
+        """Test creating a batch of recipes with nested attributes."""
+        Tag.objects.create(user=self.user, name='lunch')
+        payload = self._bulk_payload(3)
+
+        res = self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        results = res.data['results']
+        self.assertEqual([r['index'] for r in results], [0, 1, 2])
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        for result, item in zip(results, payload):
+            recipe = recipes.get(id=result['id'])
+            self.assertEqual(recipe.title, item['title'])
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 1)
+
+    def test_bulk_create_queries_independent_of_batch_size(self):
+        """Test bulk create runs a fixed number of queries."""
+        with CaptureQueriesContext(connection) as small:
+            res = self.client.post(
+                RECIPE_BULK_URL, self._bulk_payload(2, 'Small'),
+                format='json',
+            )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.post(
+                RECIPE_BULK_URL, self._bulk_payload(20, 'Large'),
+                format='json',
+            )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_create_atomic_rejects_invalid_batch(self):
+        """Test an invalid item rejects the whole batch by default."""
+        payload = self._bulk_payload(2)
+        payload[1]['price'] = 'free'
+
+        res = self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['results'][0]['index'], 1)
+        self.assertIn('price', res.data['results'][0]['errors'])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_partial_success(self):
+        """Test partial mode creates the valid items."""
+        payload = self._bulk_payload(3)
+        payload[1]['title'] = ''
+
+        res = self.client.post(
+            f'{RECIPE_BULK_URL}?mode=partial', payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        results = res.data['results']
+        self.assertIn('id', results[0])
+        self.assertIn('errors', results[1])
+        self.assertIn('id', results[2])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(RECIPE_BULK_MAX_BATCH_SIZE=2)
+    def test_bulk_create_batch_size_limit(self):
+        """Test batches above the configured size are rejected."""
+        res = self.client.post(
+            RECIPE_BULK_URL, self._bulk_payload(3), format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def _export(self, params=None):
+        """Request an export and return the response and its body."""
+        res = self.client.get(RECIPE_EXPORT_URL, params)
+        body = b''.join(res.streaming_content).decode()
+        return res, body
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as NDJSON matches the detail view."""
+        recipe1 = create_recipe(user=self.user, title='Soto')
+        recipe1.tags.add(Tag.objects.create(user=self.user, name='Soup'))
+        recipe1.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Chicken')
+        )
+        recipe2 = create_recipe(user=self.user, title='Sate')
+        other_user = create_user(email='other@example.com', password='pw1')
+        create_recipe(user=other_user)
+
+        res, body = self._export()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [recipe2.id, recipe1.id])
+        detail = self.client.get(detail_url(recipe1.id)).json()
+        self.assertEqual(rows[1], detail)
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV."""
+        recipe = create_recipe(user=self.user, desc='Line one\nLine two')
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Lunch'),
+            Tag.objects.create(user=self.user, name='Quick'),
+        )
+
+        res, body = self._export({'output': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], str(recipe.id))
+        self.assertEqual(rows[0]['desc'], recipe.desc)
+        self.assertEqual(rows[0]['tags'], 'Lunch|Quick')
+        self.assertEqual(rows[0]['ingredients'], '')
+
+    def test_export_applies_filters(self):
+        """Test exporting honours the tag filter."""
+        recipe = create_recipe(user=self.user)
+        create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        recipe.tags.add(tag)
+
+        res, body = self._export({'tags': tag.id})
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [recipe.id])
+
+    def test_export_invalid_output(self):
+        """Test an unknown export format gives a bad request."""
+        res = self.client.get(RECIPE_EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_reads_in_chunks(self):
+        """Test the export generator pages through recipes by id."""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(export.iter_recipes(
+                Recipe.objects.filter(user=self.user), chunk_size=2,
+            ))
+
+        self.assertEqual(
+            [row['id'] for row in rows], [r.id for r in reversed(recipes)]
+        )
+        # 3 chunks of recipes + tags + ingredients, then an empty chunk.
+        self.assertEqual(len(ctx), 10)
+
+    def _create_facet_data(self):
+        """Create recipes, tags and ingredients for facet tests."""
+        lunch = Tag.objects.create(user=self.user, name='Lunch')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        Tag.objects.create(user=self.user, name='Unused')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe1 = create_recipe(user=self.user)
+        recipe1.tags.add(lunch, quick)
+        recipe1.ingredients.add(salt)
+        recipe2 = create_recipe(user=self.user)
+        recipe2.tags.add(lunch)
+        other_user = create_user(email='other@example.com', password='pw1')
+        Tag.objects.create(user=other_user, name='Other')
+        return lunch, quick, salt
+
+    def test_facets(self):
+        """Test facet counts for all recipes are computed in one query."""
+        lunch, quick, salt = self._create_facet_data()
+
+        # one aggregate query for tags and ingredients
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_FACETS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'], [
+            {'id': lunch.id, 'name': 'Lunch', 'count': 2},
+            {'id': quick.id, 'name': 'Quick', 'count': 1},
+            {'id': res.data['tags'][2]['id'], 'name': 'Unused', 'count': 0},
+        ])
+        self.assertEqual(res.data['ingredients'], [
+            {'id': salt.id, 'name': 'Salt', 'count': 1},
+        ])
+
+    def test_facets_restricted_to_filter(self):
+        """Test facet counts only cover recipes matching the filter."""
+        lunch, quick, salt = self._create_facet_data()
+
+        res = self.client.get(RECIPE_FACETS_URL, {'tags': quick.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        counts = {tag['name']: tag['count'] for tag in res.data['tags']}
+        self.assertEqual(counts, {'Lunch': 1, 'Quick': 1, 'Unused': 0})
+        self.assertEqual(res.data['ingredients'][0]['count'], 1)
+
+    def test_list_conditional_get(self):
+        """Test the list answers 304 while the recipes are unchanged."""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+
+        # only the ETag aggregate
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_conditional_get_varies_on_accept(self):
+        """Test validators of one renderer do not match another."""
+        recipe = create_recipe(user=self.user)
+        for url in (RECIPE_URL, detail_url(recipe.id)):
+            res = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertIn('Accept', res['Vary'])
+
+            res = self.client.get(
+                url, HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=res['ETag'],
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res['Content-Type'], 'text/html; charset=utf-8')
+            self.assertIn('Accept', res['Vary'])
+
+    def test_list_etag_changes_on_delete(self):
+        """Test deleting an older recipe invalidates client copies, also
+        those revalidated by date alone."""
+        recipe = create_recipe(user=self.user)
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+        self.assertNotIn('Last-Modified', res)
+
+        recipe.delete()
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(
+            RECIPE_URL, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60),
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_detail_conditional_get(self):
+        """Test the detail answers 304 until the recipe or a tag changes."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        recipe.tags.add(tag)
+        res = self.client.get(detail_url(recipe.id))
+        etag = res['ETag']
+
+        res = self.client.get(
+            detail_url(recipe.id),
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified'],
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        tag.name = 'Dinner'
+        tag.save()
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Dinner')
+
+    def test_detail_conditional_get_not_found(self):
+        """Test conditional requests for unknown recipes give 404."""
+        res = self.client.get(detail_url(0), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class ImageUploadTest(TestCase):
     """Test for the image upload API."""
@@ -495,3 +1216,119 @@ class ImageUploadTest(TestCase):
         res = self.client.post(url, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _upload(self, size=(10, 10), image_format='JPEG'):
+        """Upload a generated image and return the response."""
+        url = image_upload_url(recipe_id=self.recipe.id)
+        suffix = f'.{image_format.lower()}'
+        with tempfile.NamedTemporaryFile(suffix=suffix) as image_file:
+            image = Image.new(mode='RGB', size=size)
+            image.save(image_file, format=image_format)
+            image_file.seek(0)
+            res = self.client.post(
+                url, {'image': image_file}, format='multipart',
+            )
+        # Let tearDown delete the uploaded file.
+        self.recipe.refresh_from_db()
+        return res
+
+    def test_upload_png_image(self):
+        """Test uploading a PNG image sets its content type."""
+        res = self._upload(image_format='PNG')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        with self.recipe.image.open() as f:
+            self.assertEqual(Image.open(f).format, 'PNG')
+
+    def test_upload_identical_images_share_file(self):
+        """Test identical uploads are stored once under their hash."""
+        other = create_recipe(user=self.user)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new(mode='RGB', size=(10, 10)).save(image_file, 'JPEG')
+            image_file.seek(0)
+            digest = hashlib.sha256(image_file.read()).hexdigest()
+            for recipe in [self.recipe, other]:
+                image_file.seek(0)
+                res = self.client.post(
+                    image_upload_url(recipe.id),
+                    {'image': image_file},
+                    format='multipart',
+                )
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        self.assertEqual(
+            self.recipe.image.name,
+            f'uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.jpg',
+        )
+        self.assertEqual(image_references(self.recipe.image.name), 2)
+
+    @patch('recipe.renditions.schedule')
+    def test_reupload_deletes_replaced_image(self, schedule):
+        """Test the replaced image is deleted after the upload commits."""
+        self._upload()
+        old_path = self.recipe.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(size=(20, 20))
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+
+    @patch('recipe.renditions.schedule')
+    def test_delete_recipe_keeps_shared_image(self, schedule):
+        """Test deleting a recipe only deletes images no one else uses."""
+        self._upload()
+        path = self.recipe.image.path
+        other = create_recipe(user=self.user, image=self.recipe.image.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_upload_streams_to_temp_file(self):
+        """Test uploads are never buffered in memory."""
+        with patch(
+            'django.core.files.uploadhandler.'
+            'MemoryFileUploadHandler.receive_data_chunk'
+        ) as receive:
+            res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        receive.assert_not_called()
+
+    def test_upload_unsupported_format(self):
+        """Test uploading an image in another format fails."""
+        res = self._upload(image_format='GIF')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_upload_too_large(self):
+        """Test uploading a file over the size limit fails."""
+        res = self._upload(size=(100, 100))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('bytes', res.data['image'][0])
+
+    @override_settings(RECIPE_IMAGE_MAX_DIMENSION=50)
+    def test_upload_too_wide(self):
+        """Test uploading an image over the dimension limit fails."""
+        res = self._upload(size=(51, 10))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=100)
+    def test_upload_decompression_bomb(self):
+        """Test images with too many pixels are rejected undecoded."""
+        with patch('PIL.ImageFile.ImageFile.load') as load:
+            res = self._upload(size=(20, 20))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        load.assert_not_called()
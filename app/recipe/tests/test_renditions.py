@@ -0,0 +1,190 @@
+"""
+Test for recipe image renditions.
+"""
+import os
+import tempfile
+import threading
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe
+from recipe import renditions
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def delete_renditions(recipe):
+    """Delete the image of recipe and its renditions."""
+    recipe.refresh_from_db()
+    for names in (recipe.image_renditions or {}).values():
+        for name in names.values():
+            default_storage.delete(name)
+    recipe.image.delete()
+
+
+@override_settings(RECIPE_RENDITION_WORKERS=0)
+class RenditionTests(TestCase):
+    """Test rendering renditions of uploaded images."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testing1q2w3e',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample Recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+
+    def tearDown(self):
+        delete_renditions(self.recipe)
+
+    def _upload(self, size=(1200, 800)):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new(mode='RGB', size=size).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(
+                    image_upload_url(self.recipe.id),
+                    {'image': image_file},
+                    format='multipart',
+                )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_upload_renders_renditions(self):
+        """Test uploading an image renders resized JPEG/WebP copies."""
+        self._upload()
+
+        self.recipe.refresh_from_db()
+        thumbnail = self.recipe.image_renditions['thumbnail']
+        with default_storage.open(thumbnail['webp']) as f:
+            image = Image.open(f)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (320, 213))
+        with default_storage.open(thumbnail['jpeg']) as f:
+            self.assertEqual(Image.open(f).format, 'JPEG')
+
+        res = self.client.get(detail_url(self.recipe.id))
+        urls = res.data['image_renditions']
+        self.assertEqual(set(urls), set(renditions.SIZES))
+        self.assertTrue(urls['medium']['webp'].startswith('http://'))
+
+    def test_reupload_resets_renditions(self):
+        """Test renditions of a replaced image are not served."""
+        self._upload()
+        delete_renditions(self.recipe)
+
+        with override_settings(RECIPE_RENDITION_WORKERS=1):
+            with self.settings(RECIPE_RENDITION_QUEUE_SIZE=0):
+                self.recipe.refresh_from_db()
+                with tempfile.NamedTemporaryFile(suffix='.jpg') as f:
+                    Image.new(mode='RGB', size=(10, 10)).save(f, 'JPEG')
+                    f.seek(0)
+                    res = self.client.post(
+                        image_upload_url(self.recipe.id),
+                        {'image': f},
+                        format='multipart',
+                    )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertIsNone(res.data['image_renditions'])
+
+    def test_stale_renditions_not_saved(self):
+        """Test renditions of an image no longer in use are discarded."""
+        self.assertFalse(renditions.save_renditions(
+            self.recipe.id, 'uploads/recipe/gone.jpg', {},
+        ))
+
+    def test_backfill_command(self):
+        """Test the backfill command renders images without renditions."""
+        self._upload(size=(100, 100))
+        Recipe.objects.filter(id=self.recipe.id).update(image_renditions=None)
+        out = StringIO()
+
+        call_command('backfill_renditions', workers=1, stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertIn('Rendered 1 images', out.getvalue())
+        self.assertTrue(all(
+            os.path.exists(default_storage.path(name))
+            for names in self.recipe.image_renditions.values()
+            for name in names.values()
+        ))
+
+
+class ImageReuseRaceTests(TransactionTestCase):
+    """Test deleting an unused image while an upload reuses it."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.override = override_settings(MEDIA_ROOT=self.tmp_dir.name)
+        self.override.enable()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testing1q2w3e',
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        self.tmp_dir.cleanup()
+
+    def _recipe(self, **params):
+        return Recipe.objects.create(
+            user=self.user, title='Sample Recipe', time_minutes=5,
+            price=Decimal('5.50'), **params,
+        )
+
+    def test_delete_waits_for_upload_reusing_image(self):
+        """Test an upload reusing the file of a deleted recipe keeps it."""
+        old = self._recipe(image=ContentFile(b'image', name='old.jpg'))
+        name = old.image.name
+        saved = threading.Event()
+        commit = threading.Event()
+
+        def upload():
+            try:
+                with transaction.atomic():
+                    self._recipe(image=ContentFile(b'image', name='new.jpg'))
+                    saved.set()
+                    commit.wait(5)
+            finally:
+                connection.close()
+
+        uploader = threading.Thread(target=upload)
+        uploader.start()
+        self.assertTrue(saved.wait(5))
+        # The upload commits while the delete below waits for it.
+        timer = threading.Timer(0.5, commit.set)
+        timer.start()
+        old.delete()
+        uploader.join()
+        timer.join()
+
+        new = Recipe.objects.get()
+        self.assertEqual(new.image.name, name)
+        self.assertTrue(default_storage.exists(name))
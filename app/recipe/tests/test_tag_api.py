@@ -11,6 +11,7 @@ from rest_framework.test import APIClient
 from rest_framework import status
 
 from core.models import Tag, Recipe
+from recipe import filters
 from recipe.serializers import TagSerializer
 
 URL_TAGS = reverse("recipe:tag-list")
@@ -97,6 +98,17 @@ class PrivateTagApiTest(TestCase):
         self.assertEqual(tags.name, payload['name'])
         self.assertEqual(tags.user, self.user)
 
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to an existing name gives a bad request."""
+        Tag.objects.create(user=self.user, name='Lunch')
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'lunch'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Dinner')
+
     def test_delete_tag(self):
         """Test to delete a tag."""
         tag = Tag.objects.create(user=self.user, name='Tag1')
@@ -150,3 +162,24 @@ class PrivateTagApiTest(TestCase):
         res = self.client.get(URL_TAGS, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_autocomplete_tags_limited(self):
+        """Test autocomplete returns a bounded number of tags."""
+        Tag.objects.bulk_create([
+            Tag(user=self.user, name=f'Dinner {i}') for i in range(30)
+        ])
+
+        res = self.client.get(URL_TAGS, {'q': 'Din'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), filters.AUTOCOMPLETE_LIMIT)
+
+    def test_autocomplete_tags_special_characters(self):
+        """Test regex characters in the term are matched literally."""
+        tag = Tag.objects.create(user=self.user, name='C++ (fast)')
+        Tag.objects.create(user=self.user, name='Cake')
+
+        res = self.client.get(URL_TAGS, {'q': 'c++ ('})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['id'], tag.id)
@@ -0,0 +1,86 @@
+"""
+Streaming upload handling and header-only validation of recipe images.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+from rest_framework import serializers
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to a temporary file, never holding them in memory.
+
+    Bytes past RECIPE_IMAGE_MAX_UPLOAD_SIZE are counted but not written,
+    `ImageHeaderField` then rejects the file by its size. The SHA-256 of
+    the content is computed on the way for `ContentAddressedStorage`.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+            self.file.write(raw_data)
+            self.digest.update(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.digest.hexdigest()
+        return file
+
+
+class ImageHeaderField(serializers.ImageField):
+    """Image field validated from the image header only.
+
+    Format and dimensions are read without decoding pixel data, so
+    decompression bombs are rejected before anything decodes them.
+    """
+    default_error_messages = {
+        **serializers.ImageField.default_error_messages,
+        'too_large': 'Images may be at most {max_size} bytes.',
+        'invalid_format': 'Upload a JPEG, PNG or WebP image.',
+        'too_many_pixels': (
+            'Images may be at most {max_dimension} pixels wide and high, '
+            'and {max_pixels} pixels in total.'
+        ),
+    }
+
+    def to_internal_value(self, data):
+        file_object = serializers.FileField.to_internal_value(self, data)
+        if file_object.size > settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE:
+            self.fail(
+                'too_large', max_size=settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE,
+            )
+
+        try:
+            # Image.open parses the header and leaves the pixels alone.
+            image = Image.open(file_object)
+            image_format, (width, height) = image.format, image.size
+        except (Image.DecompressionBombError, OSError, SyntaxError):
+            self.fail('invalid_image')
+        finally:
+            file_object.seek(0)
+
+        if image_format not in ALLOWED_FORMATS:
+            self.fail('invalid_format')
+        max_dimension = settings.RECIPE_IMAGE_MAX_DIMENSION
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if (
+            max(width, height) > max_dimension
+            or width * height > max_pixels
+        ):
+            self.fail(
+                'too_many_pixels',
+                max_dimension=max_dimension, max_pixels=max_pixels,
+            )
+
+        file_object.image = image
+        file_object.content_type = Image.MIME[image_format]
+        return file_object
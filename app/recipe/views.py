@@ -1,24 +1,64 @@
 """
 Views for Recipe API
 """
+from functools import partial
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, \
+    StreamingHttpResponse
+from django.utils.encoding import iri_to_uri
 from rest_framework import (
     viewsets,
     mixins,
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from recipe import (
+    conditional,
+    export,
+    filters,
+    renditions,
+    serializers,
+    uploads,
+)
+from recipe.cache import CachedResponseMixin, bump_generation
+from recipe.pagination import RecipeCursorPagination
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+
+BULK_ATOMIC = 'atomic'
+BULK_PARTIAL = 'partial'
+BULK_MODES = (BULK_ATOMIC, BULK_PARTIAL)
+
+SPARSE_ACTIONS = ('list', 'retrieve')
+# Columns read for serializer fields other than plain model fields.
+SPARSE_FIELD_COLUMNS = {
+    'tags': [],
+    'ingredients': [],
+    'image_renditions': ['image', 'image_renditions'],
+}
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
 
 
 @extend_schema_view(
@@ -28,17 +68,28 @@ from recipe import serializers
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.'
-            )
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Autocomplete: return at most '
+                            f'{filters.AUTOCOMPLETE_LIMIT} items whose name '
+                            'starts with or is similar to this term.'
+            ),
         ]
     )
 )
 class BaseClassRecipeAttrViewset(
+        CachedResponseMixin,
         mixins.DestroyModelMixin,
         mixins.UpdateModelMixin,
         mixins.ListModelMixin,
         viewsets.GenericViewSet):
     """Base class for recipe attributes."""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -47,39 +98,117 @@ class BaseClassRecipeAttrViewset(
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = filters.assigned_to_recipes(queryset)
 
-        return queryset.filter(
+        queryset = queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name')
+
+        term = self.request.query_params.get('q', '').strip()
+        if len(term) > filters.MAX_AUTOCOMPLETE_LENGTH:
+            raise ValidationError({
+                'q': f'At most {filters.MAX_AUTOCOMPLETE_LENGTH} characters.'
+            })
+        if term and self.action == 'list':
+            queryset = filters.autocomplete(queryset, term)
+
+        return queryset
+
+    def perform_update(self, serializer):
+        """Update the item, rejecting names already used by the user."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {'name': 'An item with this name already exists.'}
+            )
+
+
+RECIPE_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        'tags',
+        OpenApiTypes.STR,
+        description='Comma separated list of tags IDs to filter'
+    ),
+    OpenApiParameter(
+        'tags_mode',
+        OpenApiTypes.STR, enum=list(filters.MATCH_MODES),
+        description='Match any (default) or all of the tags.'
+    ),
+    OpenApiParameter(
+        'ingredients',
+        OpenApiTypes.STR,
+        description='Comma separated list of ingredients IDs to filter'
+    ),
+    OpenApiParameter(
+        'ingredients_mode',
+        OpenApiTypes.STR, enum=list(filters.MATCH_MODES),
+        description='Match any (default) or all of the ingredients.'
+    ),
+    OpenApiParameter(
+        'search',
+        OpenApiTypes.STR,
+        description='Full-text search on title and description. '
+                    'Unpaginated results are ranked by relevance.'
+    ),
+]
+
+
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of the fields to return.'
+    ),
+    OpenApiParameter(
+        'omit',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to leave out.'
+    ),
+]
 
 
 @extend_schema_view(
     list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                'tags',
-                OpenApiTypes.STR,
-                description='Comma separated list of tags IDs to filter'
-            ),
-            OpenApiParameter(
-                'ingredients',
-                OpenApiTypes.STR,
-                description='Comma separated list of ingredients IDs to filter'
-            )
-        ]
-    )
+        parameters=RECIPE_FILTER_PARAMETERS + SPARSE_FIELDS_PARAMETERS,
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """View for manage Recipes APIs."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
 
     def _params_to_ints(self, qs):
         """Convert a list of string into list of integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+        str_ids = qs.split(',')
+        if len(str_ids) > filters.MAX_FILTER_IDS:
+            raise ValidationError(
+                f'At most {filters.MAX_FILTER_IDS} ids can be filtered on.'
+            )
+        if not all(filters.ID_RE.fullmatch(str_id) for str_id in str_ids):
+            raise ValidationError(
+                'Expected a comma separated list of integer ids.'
+            )
+
+        return [int(str_id) for str_id in str_ids]
+
+    def _param_to_mode(self, name):
+        """Return the match mode requested through `name`."""
+        mode = self.request.query_params.get(name, filters.MATCH_ANY)
+        if mode not in filters.MATCH_MODES:
+            raise ValidationError(
+                {name: f'Must be one of: {", ".join(filters.MATCH_MODES)}.'}
+            )
+
+        return mode
 
     def get_queryset(self):
         """retrieve recipes for current authenticated user"""
@@ -88,39 +217,293 @@ class RecipeViewSet(viewsets.ModelViewSet):
         queryset = self.queryset
 
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = filters.filter_by_related_ids(
+                queryset, 'tags',
+                self._params_to_ints(tags),
+                mode=self._param_to_mode('tags_mode'),
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = filters.filter_by_related_ids(
+                queryset, 'ingredients',
+                self._params_to_ints(ingredients),
+                mode=self._param_to_mode('ingredients_mode'),
+            )
 
-        return queryset.filter(
+        prefetches = {
+            'tags': Prefetch(
+                'tags',
+                queryset=Tag.objects.only('id', 'name').order_by('id'),
+            ),
+            'ingredients': Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id', 'name').order_by('id'),
+            ),
+        }
+        fields = self._sparse_fields()
+        if fields is not None:
+            prefetches = {
+                name: prefetch for name, prefetch in prefetches.items()
+                if name in fields
+            }
+            queryset = queryset.only('id', *(
+                column for name in fields
+                for column in SPARSE_FIELD_COLUMNS.get(name, [name])
+            ))
+
+        queryset = queryset.filter(
             user=self.request.user
-        ).order_by('-id').distinct()
+        ).order_by('-id').prefetch_related(*prefetches.values())
+
+        search = self.request.query_params.get('search', '').strip()
+        if len(search) > filters.MAX_SEARCH_LENGTH:
+            raise ValidationError({
+                'search': f'At most {filters.MAX_SEARCH_LENGTH} characters.'
+            })
+        if search:
+            queryset = filters.search_recipes(queryset, search)
+
+        return queryset
+
+    def _sparse_fields(self):
+        """Return the serializer fields selected with `fields` and
+        `omit` on list and retrieve, or None to use all of them."""
+        params = self.request.query_params
+        if self.action not in SPARSE_ACTIONS or not (
+                'fields' in params or 'omit' in params):
+            return None
+
+        available = self.get_serializer_class().Meta.fields
+        fields = available
+        for param in ('fields', 'omit'):
+            if param not in params:
+                continue
+            names = [
+                name.strip() for name in params[param].split(',')
+                if name.strip()
+            ]
+            unknown = sorted(set(names) - set(available))
+            if unknown:
+                raise ValidationError({
+                    param: f'Unknown fields: {", ".join(unknown)}. '
+                           f'Expected any of: {", ".join(available)}.'
+                })
+            fields = [
+                name for name in fields
+                if (name in names) == (param == 'fields')
+            ]
+
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self._sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         """return the serializer class for request."""
-        if self.action == 'list':
+        if self.action in ('list', 'bulk'):
             self.serializer_class = serializers.RecipeSerializer
         elif self.action == 'upload_image':
             self.serializer_class = serializers.RecipeImageSerializer
+        elif self.action == 'facets':
+            self.serializer_class = serializers.RecipeFacetsSerializer
 
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        validators = conditional.list_validators(
+            self.filter_queryset(self.get_queryset()),
+            request.accepted_media_type,
+        )
+        return conditional.conditional_response(
+            request, validators,
+            partial(
+                self._cached_response,
+                self._list_rows, request, *args, **kwargs
+            ),
+        )
+
+    def _list_rows(self, request, *args, **kwargs):
+        """List recipes from plain rows rather than model instances.
+
+        Output matches `RecipeSerializer`, which still documents the
+        response, see `serializers.recipe_list_data`.
+        """
+        fields = self._sparse_fields()
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(
+            None,
+        ).values(*serializers.recipe_list_values(fields))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serializers.recipe_list_data(page, fields)
+            )
+
+        return Response(serializers.recipe_list_data(queryset, fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = conditional.detail_validators(
+            self.get_queryset(), self.kwargs['pk'],
+            request.accepted_media_type,
+        )
+        return conditional.conditional_response(
+            request, validators,
+            partial(
+                self._cached_response,
+                super().retrieve, request, *args, **kwargs
+            ),
+        )
+
     def perform_create(self, serializer):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
+    @extend_schema(
+        request=serializers.RecipeSerializer(many=True),
+        responses={
+            status.HTTP_201_CREATED: OpenApiTypes.OBJECT,
+            status.HTTP_207_MULTI_STATUS: OpenApiTypes.OBJECT,
+        },
+        parameters=[
+            OpenApiParameter(
+                'mode',
+                OpenApiTypes.STR, enum=[*BULK_MODES],
+                description='Reject the whole batch on any invalid item '
+                            '(atomic, default) or create the valid ones.'
+            ),
+        ],
+    )
+    @action(methods=['POST'], detail=False)
+    def bulk(self, request):
+        """Create a batch of recipes in one request."""
+        mode = request.query_params.get('mode', BULK_ATOMIC)
+        if mode not in BULK_MODES:
+            raise ValidationError(
+                {'mode': f'Must be one of: {", ".join(BULK_MODES)}.'}
+            )
+        max_size = settings.RECIPE_BULK_MAX_BATCH_SIZE
+        if not isinstance(request.data, list) or not request.data:
+            raise ValidationError('Expected a non-empty list of recipes.')
+        if len(request.data) > max_size:
+            raise ValidationError(
+                f'At most {max_size} recipes can be created at once.'
+            )
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        results = []
+        valid = []
+        for index, item in enumerate(request.data):
+            try:
+                valid.append(
+                    (index, serializer.child.run_validation(item))
+                )
+            except ValidationError as exc:
+                results.append({'index': index, 'errors': exc.detail})
+
+        if results and mode == BULK_ATOMIC:
+            return Response(
+                {'results': results},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        recipes = serializer.create(
+            [{**attrs, 'user': request.user} for _, attrs in valid]
+        )
+        # bulk_create sends no model signals.
+        bump_generation(request.user.id)
+        results += [
+            {'index': index, 'id': recipe.id}
+            for (index, _), recipe in zip(valid, recipes)
+        ]
+        results.sort(key=lambda result: result['index'])
+
+        return Response(
+            {'results': results},
+            status=(
+                status.HTTP_207_MULTI_STATUS if len(valid) < len(results)
+                else status.HTTP_201_CREATED
+            ),
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'output',
+                OpenApiTypes.STR, enum=[*EXPORT_CONTENT_TYPES],
+                description='Export format, ndjson by default.'
+            ),
+        ] + RECIPE_FILTER_PARAMETERS,
+        responses={
+            (status.HTTP_200_OK, content_type): OpenApiTypes.STR
+            for content_type in EXPORT_CONTENT_TYPES.values()
+        },
+    )
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """Stream all matching recipes of the user as NDJSON or CSV."""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_CONTENT_TYPES:
+            raise ValidationError({
+                'output': f'Must be one of: {", ".join(EXPORT_CONTENT_TYPES)}.'
+            })
+
+        recipes = export.iter_recipes(self.get_queryset(), request=request)
+        lines = (
+            export.csv_lines(recipes) if output == 'csv'
+            else export.ndjson_lines(recipes)
+        )
+        response = StreamingHttpResponse(
+            lines, content_type=EXPORT_CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{output}"'
+        )
+        return response
+
+    @extend_schema(parameters=RECIPE_FILTER_PARAMETERS)
+    @action(methods=['GET'], detail=False)
+    def facets(self, request):
+        """Return tags and ingredients with their recipe counts.
+
+        Counts are restricted to the recipes matching the tags,
+        ingredients and search filters when any of them is given.
+        """
+        recipes = None
+        if any(request.query_params.get(param)
+               for param in ('tags', 'ingredients', 'search')):
+            recipes = self.get_queryset().order_by().values('id')
+
+        serializer = self.get_serializer(
+            filters.facet_counts(request.user, recipes)
+        )
+        return Response(serializer.data)
+
+    def initialize_request(self, request, *args, **kwargs):
+        # self.action is only set once the request is initialized.
+        if self.action_map.get(request.method.lower()) == 'upload_image':
+            request.upload_handlers = [uploads.ImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to recipe."""
         recipe = self.get_object()
-        # print(recipe)
+        old_image = recipe.image.name
         serializer = self.get_serializer(recipe, data=request.data)
-        # print(serializer)
 
         if serializer.is_valid():
-            serializer.save()
+            # Stored files are locked until the reference commits.
+            with transaction.atomic():
+                recipe = serializer.save(image_renditions=None)
+                # Encoding runs off the request path, see recipe.renditions.
+                transaction.on_commit(partial(
+                    renditions.schedule, recipe.id, recipe.image.name,
+                ))
+                if old_image and old_image != recipe.image.name:
+                    transaction.on_commit(partial(
+                        renditions.delete_unused_image, old_image,
+                    ))
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -136,3 +519,41 @@ class TagViewSet(BaseClassRecipeAttrViewset):
     """View for manage Tags API."""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+
+
+class RecipeMediaView(APIView):
+    """Serve recipe images and renditions to the owner of the recipe."""
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+
+    def _is_owner(self, name):
+        """Return whether a recipe of the user uses the file name."""
+        recipes = Recipe.objects.filter(user=self.request.user)
+        rendition = renditions.parse_rendition_name(name)
+        if rendition is not None:
+            size, fmt = rendition
+            recipes = recipes.filter(
+                **{f'image_renditions__{size}__{fmt}': name}
+            )
+        else:
+            recipes = recipes.filter(image=name)
+        return recipes.exists()
+
+    @extend_schema(responses={200: OpenApiTypes.BINARY})
+    def get(self, request, name):
+        """Hand the file to nginx, or serve it directly in DEBUG."""
+        if not self._is_owner(name):
+            raise Http404
+        if settings.DEBUG:
+            return FileResponse(default_storage.open(name))
+
+        # nginx streams the file from its internal location.
+        response = HttpResponse()
+        del response['Content-Type']
+        response['X-Accel-Redirect'] = iri_to_uri(
+            settings.MEDIA_ACCEL_REDIRECT_URL + name
+        )
+        return response
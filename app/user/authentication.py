@@ -0,0 +1,172 @@
+"""
+Token authentication classes of the API.
+"""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from user.tokens import verify_access_token
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """Thread-safe LRU mapping of token keys to users, with a TTL."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached user of key, or None.
+
+        The statistics are logged every AUTH_TOKEN_CACHE_STATS_INTERVAL
+        lookups.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                user = None
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                user = entry[0]
+            interval = settings.AUTH_TOKEN_CACHE_STATS_INTERVAL
+            stats = None
+            if interval and (self.hits + self.misses) % interval == 0:
+                stats = self._stats()
+
+        if stats:
+            logger.info(
+                'Token cache: %(size)d entries, %(hits)d hits, '
+                '%(misses)d misses, hit rate %(hit_rate).2f.', stats,
+            )
+        return user
+
+    def set(self, key, user):
+        """Cache user as the owner of key, evicting the oldest entries."""
+        timeout = settings.AUTH_TOKEN_CACHE_TIMEOUT
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Drop the cached user of key."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        """Drop every cached token of the user."""
+        with self._lock:
+            keys = [
+                key for key, (user, _) in self._entries.items()
+                if user.pk == user_id
+            ]
+            for key in keys:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return the size, hit and miss counts and hit rate."""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication` that caches token lookups per process.
+
+    Entries are dropped when the token is deleted or the user is saved
+    (deactivation, password change) in this process; other processes see
+    such changes once the entry expires after AUTH_TOKEN_CACHE_TIMEOUT,
+    so the timeout is kept to a few seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.AUTH_TOKEN_CACHE_TIMEOUT:
+            return super().authenticate_credentials(key)
+
+        user = token_cache.get(key)
+        if user is None:
+            user, _ = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+
+        # Views may change request.user, keep the cached one untouched.
+        user = copy.copy(user)
+        return user, self.get_model()(key=key, user=user)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authenticate `Bearer` access tokens by their signature alone.
+
+    request.user is an unsaved User holding only the primary key; views
+    that need other fields must load the user themselves.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        try:
+            access = verify_access_token(auth[1].decode())
+        except (UnicodeError, signing.BadSignature):
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+
+        return get_user_model()(pk=access.user_id, is_active=True), access
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    """Describe `SignedTokenAuthentication` in the OpenAPI schema."""
+    target_class = 'user.authentication.SignedTokenAuthentication'
+    name = 'bearerAuth'
+
+    def get_security_definition(self, auto_schema):
+        return {'type': 'http', 'scheme': 'bearer'}
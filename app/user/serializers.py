@@ -5,6 +5,7 @@ from django.contrib.auth import (
     get_user_model,
     authenticate,
 )
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from rest_framework import serializers
@@ -34,6 +35,8 @@ class UserSerializer(serializers.ModelSerializer):
 
         if password:
             user.set_password(password)
+            # Signed access and refresh tokens stop working.
+            user.tokens_valid_after = timezone.now()
             user.save()
 
         return user
@@ -63,3 +66,17 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for refresh token exchanges"""
+    refresh = serializers.CharField()
+
+
+class SignedTokenSerializer(serializers.Serializer):
+    """Serializer for issued signed access and refresh tokens"""
+    access = serializers.CharField()
+    refresh = serializers.CharField()
+    expires_in = serializers.IntegerField(
+        help_text='Seconds until the access token expires.',
+    )
@@ -0,0 +1,30 @@
+"""
+Signal handlers for User API.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache
+from user.tokens import store_valid_after
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token."""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Reload users after deactivation, password or profile changes."""
+    token_cache.delete_user(instance.pk)
+    store_valid_after(instance.pk, instance)
+
+
+@receiver(post_delete, sender=get_user_model())
+def invalidate_deleted_user(sender, instance, **kwargs):
+    """Stop accepting any token of a deleted user."""
+    token_cache.delete_user(instance.pk)
+    store_valid_after(instance.pk)
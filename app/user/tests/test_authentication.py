@@ -0,0 +1,329 @@
+"""
+Test for token authentication.
+"""
+import os
+import tempfile
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe
+from user.authentication import token_cache
+
+ME_URL = reverse('user:me')
+SIGNED_TOKEN_URL = reverse('user:signed-token')
+TOKEN_REFRESH_URL = reverse('user:token-refresh')
+TOKEN_REVOKE_URL = reverse('user:token-revoke')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+# Files are shared between processes, unlike the local memory default.
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'user-api-cache'),
+    }
+}
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached and invalidated."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testing1q2w3e',
+            name='Test User',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test the second request resolves the token without a query."""
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        stats = token_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    @override_settings(AUTH_TOKEN_CACHE_STATS_INTERVAL=2)
+    def test_stats_logged(self):
+        """Test the cache statistics are logged every interval."""
+        with self.assertLogs('user.authentication', 'INFO') as logs:
+            self.client.get(ME_URL)
+            self.client.get(ME_URL)
+
+        self.assertEqual(logs.output, [
+            'INFO:user.authentication:Token cache: 1 entries, 1 hits, '
+            '1 misses, hit rate 0.50.',
+        ])
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops working at once."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user stops being authenticated at once."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_reloads_user(self):
+        """Test a password change drops the cached user."""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {'password': 'newpassword123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(token_cache), 0)
+
+    def test_cache_bounded(self):
+        """Test the least recently used token is evicted."""
+        other = Token.objects.create(
+            user=get_user_model().objects.create_user(
+                email='other@example.com',
+                password='testing1q2w3e',
+            )
+        )
+        with self.settings(AUTH_TOKEN_CACHE_SIZE=1):
+            self.client.get(ME_URL)
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {other.key}')
+            self.client.get(ME_URL)
+
+        self.assertEqual(len(token_cache), 1)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNotNone(token_cache.get(other.key))
+
+    def test_token_deleted_by_other_worker_expires(self):
+        """Test a token deleted in another process is rejected once the
+        cached lookup expires."""
+        self.client.get(ME_URL)
+        # No signal reaches this process's cache.
+        tokens = Token.objects.filter(key=self.token.key)
+        tokens._raw_delete(tokens.db)
+
+        expired = time.monotonic() + settings.AUTH_TOKEN_CACHE_TIMEOUT
+        with patch('user.authentication.time.monotonic',
+                   return_value=expired):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertLessEqual(settings.AUTH_TOKEN_CACHE_TIMEOUT, 5)
+
+    def test_update_with_stale_cached_user(self):
+        """Test an update does not save the fields of a cached user that
+        another worker changed since."""
+        self.client.get(ME_URL)
+        # As saved by another worker, whose signals miss this cache.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False, tokens_valid_after=timezone.now(),
+        )
+        self.user.refresh_from_db()
+
+        res = self.client.patch(ME_URL, {'name': 'New Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual(user.name, 'New Name')
+        self.assertFalse(user.is_active)
+        self.assertEqual(user.tokens_valid_after, self.user.tokens_valid_after)
+
+    @override_settings(AUTH_TOKEN_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        """Test every request queries the token when disabled."""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+        self.assertEqual(len(token_cache), 0)
+
+
+class SignedTokenTests(TestCase):
+    """Test signed access tokens and refresh tokens."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testing1q2w3e',
+            name='Test User',
+        )
+        self.client = APIClient()
+
+    def _issue(self):
+        res = self.client.post(SIGNED_TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': 'testing1q2w3e',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def _use(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_access_token_needs_no_auth_query(self):
+        """Test signed tokens authenticate without a token lookup."""
+        cache.clear()
+        Recipe.objects.create(
+            user=self.user,
+            title='Sample Recipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        self._use(self._issue()['access'])
+        self.client.get(RECIPES_URL)
+        # Only the ETag aggregate; auth and the response come from cache.
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_me_with_access_token(self):
+        """Test the profile is loaded for signed tokens."""
+        self._use(self._issue()['access'])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'Test User')
+
+    def test_db_token_still_accepted(self):
+        """Test DB tokens keep working next to signed tokens."""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_tampered_token_rejected(self):
+        """Test a token with a bad signature is rejected."""
+        self._use(self._issue()['access'] + 'x')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_ACCESS_TOKEN_LIFETIME=0)
+    def test_expired_token_rejected(self):
+        """Test an expired access token is rejected."""
+        access = self._issue()['access']
+        time.sleep(1)
+        self._use(access)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates_token(self):
+        """Test a refresh token can be exchanged once."""
+        refresh = self._issue()['refresh']
+
+        res = self.client.post(TOKEN_REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], refresh)
+        self._use(res.data['access'])
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_200_OK,
+        )
+
+        res = self.client.post(TOKEN_REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_tokens(self):
+        """Test revoking rejects issued access and refresh tokens."""
+        tokens = self._issue()
+        self._use(tokens['access'])
+
+        res = self.client.post(TOKEN_REVOKE_URL)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(
+            self.client.get(ME_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        res = self.client.post(
+            TOKEN_REFRESH_URL, {'refresh': tokens['refresh']},
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self._use(self._issue()['access'])
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_200_OK,
+        )
+
+    def test_revocation_by_other_worker_rejected(self):
+        """Test tokens revoked by another worker's request are rejected
+        with the cache of one worker."""
+        self._use(self._issue()['access'])
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_200_OK,
+        )
+
+        # As written by another worker, which updates only its own cache.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            tokens_valid_after=timezone.now(),
+        )
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_revocation_read_from_database_on_cache_miss(self):
+        """Test a revocation is still seen once the cache lost it."""
+        cache.clear()
+        self._use(self._issue()['access'])
+        self.client.post(TOKEN_REVOKE_URL)
+        cache.clear()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user revokes their signed tokens."""
+        self._use(self._issue()['access'])
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens(self):
+        """Test changing the password revokes signed tokens."""
+        self._use(self._issue()['access'])
+
+        res = self.client.patch(ME_URL, {'password': 'newpassword123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
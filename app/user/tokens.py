@@ -0,0 +1,145 @@
+"""
+Signed access tokens and database backed refresh tokens.
+"""
+import secrets
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import is_shared
+from core.models import RefreshToken
+
+SALT = 'user.access-token'
+# Valid-after of inactive or deleted users, rejects all of their tokens.
+REVOKED = float('inf')
+
+
+class AccessToken:
+    """Claims of a verified access token."""
+
+    def __init__(self, user_id, issued_at):
+        self.user_id = user_id
+        self.issued_at = issued_at
+
+
+def _valid_after_key(user_id):
+    return f'auth:valid-after:{user_id}'
+
+
+def _valid_after_value(user):
+    """Return the valid-after timestamp of user as a float."""
+    if user is None or not user.is_active:
+        return REVOKED
+    if user.tokens_valid_after is None:
+        return 0.0
+    return user.tokens_valid_after.timestamp()
+
+
+def _load_valid_after(user_id):
+    """Return the valid-after timestamp of the user from the database."""
+    user = get_user_model().objects.filter(pk=user_id).only(
+        'is_active', 'tokens_valid_after',
+    ).first()
+    return _valid_after_value(user)
+
+
+def store_valid_after(user_id, user=None):
+    """Publish the valid-after timestamp of the user to the cache."""
+    if is_shared():
+        cache.set(
+            _valid_after_key(user_id), _valid_after_value(user),
+            timeout=None,
+        )
+
+
+def get_valid_after(user_id):
+    """Return the timestamp before which tokens of the user are invalid.
+
+    It is cached only in a cache shared by all workers, otherwise other
+    workers would miss revocations, see `core.cache.is_shared`.
+    """
+    if not is_shared():
+        return _load_valid_after(user_id)
+    value = cache.get(_valid_after_key(user_id))
+    if value is None:
+        value = _load_valid_after(user_id)
+        cache.add(_valid_after_key(user_id), value, timeout=None)
+    return value
+
+
+def issue_access_token(user):
+    """Return a signed access token for user."""
+    return signing.dumps(
+        {'uid': user.pk, 'iat': time.time()}, salt=SALT,
+    )
+
+
+def verify_access_token(token):
+    """Return the AccessToken of token, or raise `signing.BadSignature`.
+
+    Only the signature, the age and the valid-after timestamp of the
+    user are checked, so with a shared cache this usually needs no
+    database query.
+    """
+    claims = signing.loads(
+        token, salt=SALT, max_age=settings.AUTH_ACCESS_TOKEN_LIFETIME,
+    )
+    access = AccessToken(claims['uid'], claims['iat'])
+    if access.issued_at < get_valid_after(access.user_id):
+        raise signing.BadSignature('Token revoked.')
+    return access
+
+
+def issue_tokens(user):
+    """Create a refresh token and return it with a new access token."""
+    refresh = RefreshToken.objects.create(
+        user=user, key=secrets.token_urlsafe(32),
+    )
+    return {
+        'access': issue_access_token(user),
+        'refresh': refresh.key,
+        'expires_in': settings.AUTH_ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def refresh_tokens(key):
+    """Exchange a refresh token for new tokens, or return None.
+
+    Refresh tokens are single use, each exchange rotates them.
+    """
+    refresh = RefreshToken.objects.select_related('user').filter(
+        key=key,
+    ).first()
+    if refresh is None:
+        return None
+    user = refresh.user
+    expires = refresh.created + timedelta(
+        seconds=settings.AUTH_REFRESH_TOKEN_LIFETIME,
+    )
+    with transaction.atomic():
+        deleted, _ = RefreshToken.objects.filter(key=key).delete()
+        if (
+            not deleted
+            or expires <= timezone.now()
+            or refresh.created.timestamp() < _valid_after_value(user)
+        ):
+            return None
+        return issue_tokens(user)
+
+
+def revoke_tokens(user_id):
+    """Invalidate every signed access and refresh token of the user."""
+    now = timezone.now()
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user_id).update(
+            tokens_valid_after=now,
+        )
+        RefreshToken.objects.filter(user_id=user_id).delete()
+    user = get_user_model().objects.filter(pk=user_id).first()
+    store_valid_after(user_id, user)
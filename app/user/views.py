@@ -1,18 +1,29 @@
 """
 View for User API
 """
-
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema
 from rest_framework import (
+    exceptions,
     generics,
-    authentication,
     permissions,
+    status,
 )
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    RefreshTokenSerializer,
+    SignedTokenSerializer,
 )
 
 
@@ -27,12 +38,66 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
+class CreateSignedTokenView(generics.GenericAPIView):
+    """Issue a signed access token and a refresh token for valid users."""
+    serializer_class = AuthTokenSerializer
+
+    @extend_schema(responses=SignedTokenSerializer)
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(tokens.issue_tokens(serializer.validated_data['user']))
+
+
+class RefreshSignedTokenView(generics.GenericAPIView):
+    """Exchange a refresh token for new signed tokens."""
+    serializer_class = RefreshTokenSerializer
+
+    @extend_schema(responses=SignedTokenSerializer)
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = tokens.refresh_tokens(serializer.validated_data['refresh'])
+        if data is None:
+            raise exceptions.ValidationError(
+                {'refresh': 'Invalid or expired refresh token.'}
+            )
+        return Response(data)
+
+
+class RevokeSignedTokensView(generics.GenericAPIView):
+    """Revoke every signed token of the authenticated user."""
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request):
+        tokens.revoke_tokens(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        """Retrieve and return the authenticated user."""
-        return self.request.user
+        """Retrieve and return the authenticated user.
+
+        Signed tokens only carry the primary key, and cached token users
+        may be AUTH_TOKEN_CACHE_TIMEOUT old, so updates save a fresh copy
+        rather than undo another worker's password change or revocation.
+        """
+        if (
+            self.request.method in permissions.SAFE_METHODS
+            and not isinstance(self.request.auth, tokens.AccessToken)
+        ):
+            return self.request.user
+        return get_object_or_404(get_user_model(), pk=self.request.user.pk)
@@ -1,3 +1,11 @@
+# Images are named by the hash of their content, so they never change.
+# Renditions keep their names when rendered again (backfill --force),
+# clients must revalidate them.
+map $uri $media_cache_control {
+    ~^/protected-media/renditions/  "private, max-age=300, must-revalidate";
+    default                         "private, max-age=31536000, immutable";
+}
+
 server{
     listen ${LISTEN_PORT};
 
@@ -5,6 +13,25 @@ server{
         alias /vol/static;
     }
 
+    # Media is only served through the app, which checks ownership.
+    location /static/media {
+        return 404;
+    }
+
+    location /protected-media/ {
+        internal;
+        alias /vol/static/media/;
+
+        sendfile                    on;
+        tcp_nopush                  on;
+        open_file_cache             max=10000 inactive=5m;
+        open_file_cache_valid       2m;
+        open_file_cache_min_uses    1;
+        open_file_cache_errors      on;
+
+        add_header Cache-Control    $media_cache_control;
+    }
+
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;